@@ -4,16 +4,22 @@
 # Import libraries
 import pandas as pd
 import numpy as np
-import re
+import os
+import json
 
-# Remove duplicate records
+try:
+    from scripts.clean_utils import (lookup_event_ids, canonical_team_names,
+                                     stable_athlete_ids, deduplicate_records)
+except ModuleNotFoundError:
+    from clean_utils import (lookup_event_ids, canonical_team_names,
+                             stable_athlete_ids, deduplicate_records)
+
+# Remove duplicate records, keeping the instance with more complete data.
+# Use deduplicate_records() directly to also get the conflict report.
 
 
 def drop_duplicates(df):
-    # Drop duplicate records
-    df.drop_duplicates(subset=['name', 'time_(seconds)',
-                               'season'], keep='first', inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    df, _ = deduplicate_records(df, subset=['name', 'time_(seconds)', 'season'])
     return df
 
 # Clean the combined USA Swimming and SwimSwam records, after they have
@@ -22,73 +28,28 @@ def drop_duplicates(df):
 
 def clean_combined_records(df):
 
-    team_dict = {
-        'Cal|CAL|Berkeley': 'California',
-        'Arizona St|ASU': 'Arizona State',
-        'ARIZ|ArizonaL': 'Arizona',
-        'Southern Cal|Southern Cali|USC': 'Southern California',
-        'AUB': 'Auburn',
-        'NC State|NCS': 'NC State',
-        'MICH|Michigan': 'Michigan',
-        'FLOR': 'Florida',
-        'TENN': 'Tennessee',
-        'WISC': 'Wisconsin',
-        'IU|Indiana': 'Indiana',
-        'ND|Notre Dame': 'Notre Dame',
-        'NW|Northwestern': 'Northwestern',
-        'HARV': 'Harvard',
-        'Tex|TEX': 'Texas',
-        'Virginia|UVA': 'Virginia',
-        'Stanford|STAN': 'Stanford',
-        ' Georgia|GeorgiaS|UGA': 'Georgia',
-        'Florida|Floid': 'Florida'
-    }
-
-    # Create regular expression patterns for each team name
-    patterns = {re.compile(key): value for key, value in team_dict.items()}
-
-    # Function to map team names to team IDs using regular expressions
-    def map_team_name(name):
-        for pattern, team in patterns.items():
-            if pattern.search(name):
-                return team
-        return name
-
-    # Apply the map_team_name function to the 'team' column to create a new 'team_id' column
-    df['team'] = df['team'].apply(map_team_name)
+    # Map every team name and abbreviation to one name
+    df['team'] = canonical_team_names(df['team'])
 
     # ASSIGN ATHLETE_IDs
 
-    # Show rows with no athlete_id value
-    missing_athlete_id = df[(df['athlete_id'].isnull()) & (
-        ~df['stroke'].str.contains('Relay'))]['name'].unique()
-
-    has_athlete_id = df[(df['athlete_id'].notnull()) & (
-        ~df['stroke'].str.contains('Relay'))]['name'].unique()
-
-    # See which athletes in the array missing_athlete_id are in the has_athlete_id array
-    to_assign_id = missing_athlete_id[np.isin(
-        missing_athlete_id, has_athlete_id)]
+    individual = ~df['stroke'].str.contains('Relay')
+    missing = individual & df['athlete_id'].isnull()
 
-    id_to_assign = {}
-    for name in to_assign_id:
-        # Search df['name'] for the name and locate any non-null athlete_id values
-        athlete_id = df[(df['name'] == name) & (
-            df['athlete_id'].notnull())]['athlete_id'].unique()
-        # Assign the athlete_id value to the name in the dictionary
-        id_to_assign[name] = athlete_id[0]
+    # Every row of a name that is missing an athlete_id somewhere takes the
+    # first athlete_id found for that name
+    athlete_ids = df.dropna(subset=['athlete_id']).drop_duplicates(
+        'name').set_index('name')['athlete_id']
+    to_assign_id = df['name'].isin(df.loc[missing, 'name']) & df['name'].isin(
+        df.loc[individual & df['athlete_id'].notnull(), 'name'])
+    df.loc[to_assign_id, 'athlete_id'] = df.loc[to_assign_id, 'name'].map(
+        athlete_ids)
 
-    # Use the dictionary to assign the athlete_id values to the missing values
-    for name, athlete_id in id_to_assign.items():
-        df.loc[df['name'] == name, 'athlete_id'] = athlete_id
-
-    # Show df rows missing athlete_id values
-    still_missing = df[(df['athlete_id'].isnull()) & (
-        ~df['stroke'].str.contains('Relay'))]['name'].unique()
-
-    for name in still_missing:
-        random_id = np.random.randint(100000, 999999)
-        df.loc[df['name'] == name, 'athlete_id'] = random_id
+    # Athletes still missing an athlete_id get one from a hash of their name
+    still_missing = df.loc[individual & df['athlete_id'].isnull(), 'name'].unique()
+    new_ids = stable_athlete_ids(still_missing, df)
+    to_assign_id = df['name'].isin(still_missing)
+    df.loc[to_assign_id, 'athlete_id'] = df.loc[to_assign_id, 'name'].map(new_ids)
 
     # ASSIGN TEAM IDs
 
@@ -110,22 +71,11 @@ def clean_combined_records(df):
 
     # ASSIGN EVENT_IDs
 
-    # Create a dictionary of event_id values based on pairs of distance, stroke, and event_id in the df
-    event_id_dict = {
-        50: {'FR': 1},
-        100: {'FR': 2, 'BK': 7, 'BR': 9, 'FL': 11},
-        200: {'FR': 3, 'BK': 8, 'BR': 10, 'FL': 12, 'IM': 13, 'Freestyle Relay': 15, 'Medley Relay': 18},
-        400: {'IM': 14, 'Freestyle Relay': 16, 'Medley Relay': 19},
-        500: {'FR': 4},
-        800: {'Freestyle Relay': 17},
-        1000: {'FR': 5},
-        1650: {'FR': 6}
-    }
-
-    # Assign event_id values to the df based on the event_id_dict
-    for distance, stroke, event_id in zip(df['distance'], df['stroke'], df['event_id']):
-        df.loc[(df['distance'] == distance) & (df['stroke'] == stroke),
-               'event_id'] = event_id_dict[distance][stroke]
+    # Look up every distance and stroke in the event catalog at once, and
+    # report any events the catalog doesn't know about
+    df['event_id'], unknown_events = lookup_event_ids(df)
+    if len(unknown_events):
+        print(f'No event_id for these events:\n{unknown_events.to_string(index=False)}')
 
     df.sort_values(by=['event_id', 'gender'], ascending=True, inplace=True)
     df.reset_index(drop=True, inplace=True)
@@ -186,231 +136,132 @@ def calculate_seasons_between_new_holders(df):
 # FACT CHECK RECORDS
 
 # After reviewing the combined dataframe and cleaning it, there are still some records that need to be corrected,
-# either because they are incorrect or because they are missing. This function will correct those records.
-# This is based on research with sources recorded in a jupyter notebook.
-
-
-def fact_checked_records(df):
-
-    # Post Fact-Checking Manual Cleaning
-
-    np.random.seed(23)
-
-    # Add Missing Records
-
-    # Add Tom Jager 50 Free record
-    ervin_50_free_index = df[(df['name'] == 'Anthony Ervin') &
-                             (df['event_id'] == 1)].index[0]
-    tom_jager_50_free = df.loc[ervin_50_free_index].copy()
-    tom_jager_50_free['name'] = 'Tom Jager'
-    tom_jager_50_free['season'] = 1990
-    tom_jager_50_free['date'] = pd.to_datetime('1990-01-01')
-    tom_jager_50_free['team'] = 'UCLA'
-    tom_jager_50_free['athlete_id'] = np.random.randint(100000, 999999)
-
-    # Add Maritza Correia 100 Free record
-    correia_100_free_index = df[(df['name'] == 'Maritza Correia') &
-                                (df['event_id'] == 1)].index[0]
-    correia_100_free = df.loc[correia_100_free_index].copy()
-    correia_100_free['event_id'] = 2
-    correia_100_free['distance'] = 100
-    correia_100_free['time_(string)'] = '47.56'
-    correia_100_free['time_(seconds)'] = 47.56
-    correia_100_free['season'] = 2002
-    correia_100_free['date'] = pd.to_datetime('2002-01-01')
-
-    # Add new 100 Back record for Brian Retterer
-    retterer_100_back_index = df[(df['name'] == "Brian Retterer") &
-                                 (df['event_id'] == 8)].index[0]
-    retterer_100_back = df.loc[retterer_100_back_index].copy()
-    retterer_100_back['event_id'] = 7
-    retterer_100_back['distance'] = 100
-    retterer_100_back['time_(string)'] = '45.43'
-    retterer_100_back['time_(seconds)'] = 45.43
-    retterer_100_back['season'] = 1995
-    retterer_100_back['date'] = pd.to_datetime('1995-01-01')
-
-    # Add new 100 back record for Natalie Coughlin
-    coughlin_100_back1_index = df[(df['name'] == 'Natalie Coughlin') &
-                                  (df['time_(seconds)'] == 50.57)].index[0]
-    coughlin_100_back1 = df.loc[coughlin_100_back1_index].copy()
-    coughlin_100_back1['time_(seconds)'] = 51.23
-    coughlin_100_back1['time_(string)'] = '51.23'
-    coughlin_100_back1['season'] = 2001
-    coughlin_100_back1['date'] = pd.to_datetime('2001-01-01')
-
-    # Add new 100 back record for Natalie Coughlin
-    coughlin_100_back2_index = df[(df['name'] == 'Natalie Coughlin') &
-                                  (df['time_(seconds)'] == 50.57)].index[0]
-    coughlin_100_back2 = df.loc[coughlin_100_back1_index].copy()
-    coughlin_100_back2['time_(seconds)'] = 51.66
-    coughlin_100_back2['time_(string)'] = '51.66'
-    coughlin_100_back2['season'] = 2001
-    coughlin_100_back2['date'] = pd.to_datetime('2001-01-01')
-
-    # Add new 100 back record for Marylyn Chiang
-    chiang_100_back_index = df[(df['name'] == 'Natalie Coughlin') &
-                               (df['time_(seconds)'] == 49.97)].index[0]
-    chiang_100_back = df.loc[chiang_100_back_index].copy()
-    chiang_100_back['name'] = 'Marylyn Chiang'
-    chiang_100_back['time_(seconds)'] = 52.36
-    chiang_100_back['time_(string)'] = '52.36'
-    chiang_100_back['season'] = 1999
-    chiang_100_back['date'] = pd.to_datetime('1999-01-01')
-    chiang_100_back['athlete_id'] = np.random.randint(100000, 999999)
-
-    # Add new 200 back record for Natalie Coughlin
-    coughlin_200_back1_index = df[(df['name'] == 'Natalie Coughlin') &
-                                  (df['time_(seconds)'] == 109.52)].index[0]
-    coughlin_200_back1 = df.loc[coughlin_200_back1_index].copy()
-    coughlin_200_back1['time_(string)'] = '1:51.02'
-    coughlin_200_back1['time_(seconds)'] = 111.02
-    coughlin_200_back1['season'] = 2001
-    coughlin_200_back1['date'] = pd.to_datetime('2001-01-01')
-
-    # Add new 200 back record for Natalie Coughlin
-    coughlin_200_back2_index = df[(df['name'] == 'Natalie Coughlin') &
-                                  (df['time_(seconds)'] == 109.52)].index[0]
-    coughlin_200_back2 = df.loc[coughlin_200_back2_index].copy()
-    coughlin_200_back2['time_(string)'] = '1:52.73'
-    coughlin_200_back2['time_(seconds)'] = 112.73
-    coughlin_200_back2['season'] = 2001
-    coughlin_200_back2['date'] = pd.to_datetime('2001-01-01')
-
-    # Add new 200 back record for Whitney Hedgepeth
-    hedgepeth_200_back_index = df[(df['name'] == 'Natalie Coughlin') &
-                                  (df['time_(seconds)'] == 109.52)].index[0]
-    hedgepeth_200_back = df.loc[hedgepeth_200_back_index].copy()
-    hedgepeth_200_back['name'] = 'Whitney Hedgepeth'
-    hedgepeth_200_back['time_(string)'] = '1:52.98'
-    hedgepeth_200_back['time_(seconds)'] = 112.98
-    hedgepeth_200_back['season'] = 1992
-    hedgepeth_200_back['date'] = pd.to_datetime('1992-01-01')
-    hedgepeth_200_back['team'] = 'Florida'
-    hedgepeth_200_back['athlete_id'] = np.random.randint(100000, 999999)
-
-    # Add Kristy Kowal 100 breast record in 1998
-    kowal_100_breast_index = df[(df['name'] == 'Annie Chandler') &
-                                (df['time_(seconds)'] == 58.06)].index[0]
-    kowal_100_breast = df.loc[kowal_100_breast_index].copy()
-    kowal_100_breast['name'] = 'Kristy Kowal'
-    kowal_100_breast['time_(string)'] = '59.05'
-    kowal_100_breast['time_(seconds)'] = 59.05
-    kowal_100_breast['season'] = 1998
-    kowal_100_breast['date'] = pd.to_datetime('1998-01-01')
-    kowal_100_breast['team'] = 'Georgia'
-    kowal_100_breast['athlete_id'] = np.random.randint(100000, 999999)
-
-    # Change Annie Chandler 100 breast record to 2010
-    df.loc[df['name'] == 'Annie Chandler', ['date', 'season']] = [
-        pd.to_datetime('2010-01-01'), 2010]
-
-    # Add Misty Hyman 1998 Record
-    hyman_100_fly_index = df[(df['name'] == 'Natalie Coughlin') &
-                             (df['time_(seconds)'] == 51.18)].index[0]
-    hyman_100_fly = df.loc[hyman_100_fly_index].copy()
-    hyman_100_fly['name'] = 'Misty Hyman'
-    hyman_100_fly['time_(string)'] = '51.34'
-    hyman_100_fly['time_(seconds)'] = 51.34
-    hyman_100_fly['season'] = 1998
-    hyman_100_fly['date'] = pd.to_datetime('1998-01-01')
-    hyman_100_fly['team'] = 'Stanford'
-    hyman_100_fly['athlete_id'] = np.random.randint(100000, 999999)
-
-    # Add Gil Stovall record in 200 fly
-    stovall_200_fly_index = df[(df['name'] == 'Shaune Fraser') &
-                               (df['time_(seconds)'] == 101.17)].index[0]
-    stovall_200_fly = df.loc[stovall_200_fly_index].copy()
-    stovall_200_fly['name'] = 'Gil Stovall'
-    stovall_200_fly['time_(string)'] = '1:41.33'
-    stovall_200_fly['time_(seconds)'] = 101.33
-    stovall_200_fly['season'] = 2008
-    stovall_200_fly['date'] = pd.to_datetime('2008-01-01')
-    stovall_200_fly['team'] = 'Georgia'
-    stovall_200_fly['athlete_id'] = np.random.randint(100000, 999999)
-
-    # Add George Bovell record in 200 IM in 2003
-    bovell_200_im_index = df[(df['name'] == 'Ryan Lochte') &
-                             (df['time_(seconds)'] == 101.76)].index[0]
-    bovell_200_im = df.loc[bovell_200_im_index].copy()
-    bovell_200_im['name'] = 'George Bovell'
-    bovell_200_im['time_(string)'] = '1:42.66'
-    bovell_200_im['time_(seconds)'] = 102.66
-    bovell_200_im['season'] = 2003
-    bovell_200_im['date'] = pd.to_datetime('2003-01-01')
-    bovell_200_im['team'] = 'Auburn'
-    bovell_200_im['athlete_id'] = np.random.randint(100000, 999999)
-
-    # Change first Maggie Bowen 200 IM record to 2000
-    df.loc[(df['name'] == 'Maggie Bowen') & (df['time_(seconds)'] == 115.49),
-           ['date', 'season']] = [pd.to_datetime('2000-01-01'), 2000]
-
-    # Add 2 new Julia Smit records from 2009
-    smit_400_im_index = df[(df['name'] == 'Julia Smit') &
-                           (df['time_(seconds)'] == 238.23)].index[0]
-    smit_400_im = df.loc[smit_400_im_index].copy()
-    smit_400_im['season'] = 2009
-    smit_400_im['date'] = pd.to_datetime('2009-01-01')
-    smit_400_im['time_(string)'] = '4:00.56'
-    smit_400_im['time_(seconds)'] = 240.56
-
-    # New Aaron Peirsol 200 back record in 2003
-    peirsol_200_back_index = df[(df['name'] == 'Ryan Lochte') &
-                                (df['time_(seconds)'] == 98.29)].index[0]
-    peirsol_200_back = df.loc[peirsol_200_back_index].copy()
-    peirsol_200_back['name'] = 'Aaron Peirsol'
-    peirsol_200_back['season'] = 2003
-    peirsol_200_back['date'] = pd.to_datetime('2003-01-01')
-    peirsol_200_back['time_(string)'] = '1:39.16'
-    peirsol_200_back['time_(seconds)'] = 99.16
-    peirsol_200_back['team'] = 'Texas'
-    peirsol_200_back['athlete_id'] = np.random.randint(100000, 999999)
-
-    new_records = [tom_jager_50_free, correia_100_free,
-                   retterer_100_back, coughlin_100_back1,
-                   coughlin_100_back2, chiang_100_back,
-                   coughlin_200_back1, coughlin_200_back2,
-                   hedgepeth_200_back, kowal_100_breast,
-                   hyman_100_fly, stovall_200_fly,
-                   bovell_200_im, smit_400_im,
-                   peirsol_200_back]
-
-    # Convert all new records to DataFrame and concat with one another
-    new_records_df = pd.DataFrame(new_records)
-    new_records_df = new_records_df.reset_index(drop=True)
+# added, or deleted. This is based on research with sources recorded in a jupyter notebook.
+#
+# The corrections live in data/record_corrections.json as lists of inserts, updates and deletes. Each one
+# finds its rows by matching column values (e.g. a name and a time), and a note says what it fixes:
+#   - inserts copy the first row matching copy_from and change the columns in set. new_athlete gives
+#     the copy an athlete_id of its own.
+#   - updates change the columns in set on every row matching match
+#   - deletes drop every row matching match, after the inserts have been added
+# Corrections that match on the same columns are looked up together in one pass over the records.
+
+CORRECTIONS_FILE = os.path.join('..', 'data', 'record_corrections.json')
+
+
+def load_corrections(corrections_file=CORRECTIONS_FILE):
+    with open(corrections_file) as f:
+        corrections = json.load(f)
+    if corrections.get('version') != 1:
+        raise ValueError(
+            f'Unknown corrections file version: {corrections.get("version")}')
+    return corrections
+
+
+# Turn the values read from the corrections file into the column's type
+def correction_values(df, column, values):
+    if pd.api.types.is_datetime64_any_dtype(df[column]):
+        return pd.to_datetime(pd.Series(values, dtype=object))
+    return pd.Series(values, dtype=object)
+
+
+# Group the corrections by the columns they match on, and give each group's
+# positions in entries and the values they match as a MultiIndex
+def correction_keys(df, entries, key='match'):
+    groups = {}
+    for i, entry in enumerate(entries):
+        groups.setdefault(tuple(sorted(entry[key])), []).append(i)
+
+    for columns, indices in groups.items():
+        keys = pd.MultiIndex.from_arrays(
+            [correction_values(df, column, [entries[i][key][column] for i in indices])
+             for column in columns])
+        yield list(columns), np.array(indices), keys
+
+
+# The rows of df whose values could match the keys, found with one hashed
+# isin per column, and their values as a MultiIndex to look up in the keys
+def candidate_rows(df, columns, keys):
+    candidates = np.ones(len(df), dtype=bool)
+    for level, column in enumerate(columns):
+        candidates &= df[column].isin(keys.get_level_values(level)).to_numpy()
+    rows = np.flatnonzero(candidates)
+    return rows, pd.MultiIndex.from_frame(df[columns].iloc[rows])
+
+
+# For each row of df, the position in entries of the correction it matches,
+# or -1. When several corrections match a row, the first one in the file wins.
+def match_corrections(df, entries, key='match'):
+    position = np.full(len(df), -1)
+    for columns, indices, keys in correction_keys(df, entries, key):
+        rows, values = candidate_rows(df, columns, keys)
+        unique = ~keys.duplicated()
+        found = keys[unique].get_indexer(values)
+        rows, found = rows[found >= 0], indices[unique][found[found >= 0]]
+        position[rows] = np.where(position[rows] >= 0,
+                                  np.minimum(position[rows], found), found)
+    return position
+
+
+# For each correction, the position of the first row of df it matches, or -1
+def first_matches(df, entries, key='match'):
+    first_rows = np.full(len(entries), -1)
+    for columns, indices, keys in correction_keys(df, entries, key):
+        rows, values = candidate_rows(df, columns, keys)
+        first = ~values.duplicated()
+        found = values[first].get_indexer(keys)
+        first_rows[indices] = np.where(found >= 0, rows[first][found], -1)
+    return first_rows
+
+
+# Set the columns in each correction's set on the rows that matched it
+def set_corrections(df, entries, position):
+    hit = position >= 0
+    for column in dict.fromkeys(column for entry in entries for column in entry['set']):
+        has_value = np.array([column in entry['set'] for entry in entries])
+        rows = hit.copy()
+        rows[hit] = has_value[position[hit]]
+        values = correction_values(
+            df, column, [entry['set'].get(column) for entry in entries])
+        df.loc[rows, column] = pd.Series(
+            values.to_numpy()[position[rows]]).infer_objects().to_numpy()
+    return df
 
-    # Concat new records with original DataFrame
-    df = pd.concat([df, new_records_df], ignore_index=True)
-    df = df.sort_values(
-        by=['event_id', 'gender', 'time_(seconds)']).reset_index(drop=True)
 
-    # Delete Inaccurate records
+def fact_checked_records(df, corrections_file=CORRECTIONS_FILE):
+    corrections = load_corrections(corrections_file)
+    inserts = corrections.get('inserts', [])
+    updates = corrections.get('updates', [])
+    deletes = corrections.get('deletes', [])
 
-    # Delete Simon Burnett duplicate records
-    df = df[(df['name'] != "Simon Burnett") | (
-        df['season'] != 2004)]
+    # ADD MISSING RECORDS
 
-    # Delete duplicate Natalie Coughlin 200 Fly record
-    df = df[~((df['date'] == pd.to_datetime('01-01-2002'))
-              & (df['time_(seconds)'] == 111.91))]
-    df = df[~((df['date'] == pd.to_datetime('01-01-2002'))
-              & (df['time_(seconds)'] == 102.65))]
+    first_rows = first_matches(df, inserts, key='copy_from')
+    for i in np.flatnonzero(first_rows < 0):
+        print(f'No record to copy for correction: {inserts[i]["note"]}')
+    inserts = [entry for entry, row in zip(inserts, first_rows) if row >= 0]
 
-    # Delete Peter Vanderkaay inaccurate record
-    df = df[(df['name'] != "Peter Vanderkaay") | (
-        df['time_(seconds)'] != 249.82)]
+    new_records_df = df.iloc[first_rows[first_rows >= 0]].reset_index(drop=True)
+    new_records_df = set_corrections(
+        new_records_df, inserts, np.arange(len(inserts)))
+    new_athlete = np.array([entry.get('new_athlete', False)
+                            for entry in inserts], dtype=bool)
+    new_names = new_records_df.loc[new_athlete, 'name']
+    new_records_df.loc[new_athlete, 'athlete_id'] = new_names.map(
+        stable_athlete_ids(new_names, df))
 
-    # Drop Joseph Schooling duplicates
-    df = df[(df['name'] != 'Joseph Schooling')]
+    # CORRECT RECORDS
 
-    # Remove Kelsi Worrell/Dahlia Duplicate Records
-    df = df[df['name'] != 'Kelsi Dahlia']
+    df = set_corrections(df.copy(), updates, match_corrections(df, updates))
 
-    # Inaccurate M 50 Free record
-    df = df[df['name'] != 'Roland Schoeman']
+    # Concat new records with original DataFrame
+    df = pd.concat([df, new_records_df], ignore_index=True)
+    df = df.sort_values(
+        by=['event_id', 'gender', 'time_(seconds)']).reset_index(drop=True)
+
+    # DELETE INACCURATE RECORDS
 
-    # Inaccurate M 200 Fly record
-    df = df[df['name'] != 'Mark Dylla']
+    df = df[match_corrections(df, deletes) < 0]
 
     df.reset_index(drop=True, inplace=True)
 
@@ -476,50 +327,21 @@ def calculate_record_stats(df):
     # Add the record_broken_by column to the dataframe
     df['record_broken_by'] = time_diff
 
-    # Initialize a dictionary to keep track of the new values for each athlete and event combination
-    total_improvement = {}
+    # Each record is compared with the record it broke, which is the next row
+    df['record_improvement_%'] = (
+        df['record_broken_by']/df['time_(seconds)'].shift(-1))*100
 
-    # Calculate record improvement and new record holder improvement
-    for i in range(len(df)):
-        record_sum = df.loc[i, 'record_broken_by']
-        athlete_id = df.loc[i, 'athlete_id']
-        event_id = df.loc[i, 'event_id']
+    # A record holder's improvement in an event is the sum of every record they
+    # broke in it, shown on their fastest record only. Relays are skipped.
+    holder_sum = df.groupby(['athlete_id', 'event_id'])[
+        'record_broken_by'].transform('sum')
+    first_record = ~df.duplicated(['athlete_id', 'event_id']) & df['athlete_id'].notna()
+    new_holder = df['record_broken_by'].notna() & first_record & \
+        ~df['stroke'].str.contains('Relay', na=False)
 
-        if np.isnan(record_sum):
-            pass
-        else:
-
-            # Calculate the record improvement percentage
-            df.loc[i, 'record_improvement_%'] = (
-                record_sum/df.loc[i+1, 'time_(seconds)'])*100
-
-            # Skip all relays for new_record_holder stats
-            if 'Relay' in df.loc[i, 'stroke']:
-                continue
-            else:
-
-                # Check if the current athlete and event combination already has a record_sum
-                if (athlete_id, event_id) not in total_improvement:
-                    # Calculate the sum of record_broken_by for the current athlete and event IDs
-                    new_record_holder_sum = df[(df['athlete_id'] == athlete_id) & (
-                        df['event_id'] == event_id)]['record_broken_by'].sum()
-                    total_improvement[(athlete_id, event_id)
-                                      ] = new_record_holder_sum
-                else:
-                    # Use the existing record_sum for the current athlete and event combination
-                    new_record_holder_sum = total_improvement[(
-                        athlete_id, event_id)]
-
-                # Update the new_record_holder_broken_by column in the first observation for the athlete and event combination
-                if i == df[(df['athlete_id'] == athlete_id) & (df['event_id'] == event_id)].index[0]:
-                    df.loc[i, 'new_record_holder_broken_by'] = new_record_holder_sum
-                    df.loc[i, 'new_record_holder_improvement_%'] = (
-                        new_record_holder_sum/((df.loc[i, 'time_(seconds)'])+new_record_holder_sum))*100
-
-                else:
-                    # Set the remaining values to NaN
-                    df.loc[i, 'new_record_holder_broken_by'] = np.nan
-                    df.loc[i, 'new_record_holder_improvement_%'] = np.nan
+    df['new_record_holder_broken_by'] = holder_sum.where(new_holder)
+    df['new_record_holder_improvement_%'] = (
+        holder_sum/(df['time_(seconds)']+holder_sum)*100).where(new_holder)
 
     df = calculate_seasons_between_records(df)
     df = calculate_seasons_between_new_holders(df)
@@ -541,3 +363,93 @@ def calculate_record_stats(df):
         by=['event_id', 'gender', 'time_(seconds)'], ascending=[True, True, True]).reset_index(drop=True)
 
     return df
+
+# UPDATE RECORDS WITH NEW SEASONS
+
+# When a new season is added, only its records need to be cleaned and merged
+# into the finished progression. Rows already in the progression keep their
+# corrections and IDs, and the stats are only recalculated for the event/gender
+# groups that received new records.
+
+
+def merge_new_records(df, new_records):
+    new_records = new_records.copy()
+
+    # Team names already in the progression are canonical, so only map the
+    # rest ('Southern California' would otherwise be caught by 'Cal')
+    teams = new_records['team']
+    new_records['team'] = teams.where(
+        teams.isin(df['team']), canonical_team_names(teams))
+    for column in ['athlete_id', 'team_id', 'event_id']:
+        if column not in new_records.columns:
+            new_records[column] = np.nan
+
+    # Drop records that are already in the progression
+    key = ['name', 'time_(seconds)', 'season']
+    known = pd.MultiIndex.from_frame(new_records[key]).isin(
+        pd.MultiIndex.from_frame(df[key]))
+    new_records = drop_duplicates(new_records[~known])
+
+    # ASSIGN ATHLETE_IDs
+
+    # Reuse the athlete_id already assigned to a name, then assign new ones
+    individual = ~new_records['stroke'].str.contains('Relay')
+    athlete_ids = df[~df['stroke'].str.contains('Relay')].dropna(
+        subset=['athlete_id']).drop_duplicates('name').set_index('name')['athlete_id']
+    new_ids = new_records[individual].dropna(
+        subset=['athlete_id']).drop_duplicates('name').set_index('name')['athlete_id']
+    athlete_ids = pd.concat([athlete_ids, new_ids[~new_ids.index.isin(athlete_ids.index)]])
+
+    missing = individual & new_records['athlete_id'].isnull()
+    new_records.loc[missing, 'athlete_id'] = new_records.loc[missing, 'name'].map(
+        athlete_ids)
+
+    still_missing = individual & new_records['athlete_id'].isnull()
+    new_names = new_records.loc[still_missing, 'name']
+    new_records.loc[still_missing, 'athlete_id'] = new_names.map(
+        stable_athlete_ids(new_names, pd.concat([df, new_records])))
+
+    # ASSIGN TEAM IDs
+
+    # Keep a team_id that came with the record, otherwise reuse the team's ID
+    team_ids = df.drop_duplicates('team').set_index('team')['team_id']
+    new_records['team_id'] = new_records['team_id'].fillna(
+        new_records['team'].map(team_ids))
+    next_id = df['team_id'].max() + 1
+    for team_name in new_records[new_records['team_id'].isnull()]['team'].unique():
+        new_records.loc[new_records['team'] == team_name, 'team_id'] = next_id
+        next_id += 1
+
+    # ASSIGN EVENT_IDs
+
+    new_records['event_id'], unknown_events = lookup_event_ids(new_records)
+    if len(unknown_events):
+        print(f'No event_id for these events:\n{unknown_events.to_string(index=False)}')
+
+    groups = set(zip(new_records['event_id'], new_records['gender']))
+
+    df = pd.concat([df, new_records[[column for column in df.columns
+                                     if column in new_records.columns]]],
+                   ignore_index=True)
+    return df, groups
+
+
+def update_record_stats(df, groups):
+    df = df.sort_values(
+        by=['season'], ascending=False).sort_values(
+        by=['event_id', 'gender', 'time_(seconds)'], ascending=[True, True, True]).reset_index(drop=True)
+
+    # Recalculate the stats for the touched groups on their own, since the
+    # record improvement stats never look outside an event/gender group
+    touched = pd.MultiIndex.from_frame(
+        df[['event_id', 'gender']]).isin(list(groups))
+    if touched.any():
+        df = pd.concat([df[~touched], calculate_record_stats(df[touched])])
+    df = df.sort_values(
+        by=['season'], ascending=False).sort_values(
+        by=['event_id', 'gender', 'time_(seconds)'], ascending=[True, True, True]).reset_index(drop=True)
+
+    # The new record holder stats run across the whole table, but they are a
+    # single vectorized pass so they are cheap to recalculate
+    df = calculate_seasons_between_new_holders(df)
+    return df
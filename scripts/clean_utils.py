@@ -0,0 +1,374 @@
+# This script holds the cleaning steps shared by the USA Swimming cleaners in usasw_clean_data.py
+# and the SwimSwam cleaners in ncaa_record_scrape.py. Each step works on a whole column at once
+# rather than looping over the rows with df.loc.
+
+# Import libraries
+import pandas as pd
+import numpy as np
+import io
+import re
+import functools
+import hashlib
+import unicodedata
+from collections import defaultdict
+
+# PARSE SWIM TIMES
+
+# Swim times come as SS.hh, M:SS.hh, MM:SS.hh or H:MM:SS.hh, and relay splits
+# can have a single digit of seconds (9.87). Anything else, such as 'NT', 'DQ'
+# or a blank, is marked invalid and left as NaN, and so are times whose
+# seconds (or minutes, when there are hours) are 60 or more.
+
+SWIM_TIME = re.compile(r'^(?:(?:(\d{1,6}):)?(\d{1,2}):)?(\d{1,2})(?:\.(\d{1,15}))?$')
+
+
+# Returns the times in seconds as a float64 Series aligned with the input,
+# and a boolean Series marking the entries that could not be parsed
+def parse_swim_times(times):
+    times = pd.Series(times, dtype=object).astype(str).str.strip()
+    parts = times.str.extract(SWIM_TIME)
+    hours, minutes, seconds = (pd.to_numeric(parts[k]) for k in range(3))
+    fraction = pd.to_numeric(parts[3]).fillna(0) / 10.0 ** parts[3].str.len().fillna(0)
+
+    invalid = seconds.isna() | \
+        (minutes.notna() & (seconds >= 60)) | (hours.notna() & (minutes >= 60))
+
+    # Times with minutes are added up as minutes*60 + seconds + hundredths/100,
+    # and times under a minute are read as one number, the same arithmetic the
+    # cleaners have always used so the seconds match to the last bit
+    total = hours.fillna(0) * 3600 + minutes.fillna(0) * 60 + seconds + fraction
+    short = minutes.isna() & ~invalid
+    total[short] = pd.to_numeric(times[short])
+    total[invalid] = np.nan
+    return total.astype('float64'), invalid
+
+# NORMALIZE DATES AND SEASONS
+
+# Dates show up as a bare year (YYYY, read as January 1st), DD-Mon-YY,
+# M/D/YY, M/D/YYYY or ISO dates. Each shape is picked out with a vectorized
+# match and parsed in one bulk call with its own format; anything else falls
+# back to per-value inference. A season runs from September to August and is
+# named after the year it ends in.
+
+DATE_FORMATS = {
+    r'\d{4}': '%Y',
+    r'\d{1,2}-[A-Za-z]{3}-\d{2}': '%d-%b-%y',
+    r'\d{1,2}/\d{1,2}/\d{4}': '%m/%d/%Y',
+    r'\d{1,2}/\d{1,2}/\d{2}': '%m/%d/%y',
+    r'\d{4}-\d{2}-\d{2}.*': 'ISO8601',
+}
+
+
+# Returns the dates as a datetime64 Series and the season as a float64 Series
+def normalize_dates(dates):
+    dates = pd.Series(dates)
+
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        parsed = dates
+    else:
+        # Missing dates (None, NaN or NaT) stay NaT
+        remaining = dates.notna()
+        dates = dates.astype(str).str.strip()
+        parsed = pd.Series(pd.NaT, index=dates.index, dtype='datetime64[ns]')
+        for pattern, date_format in DATE_FORMATS.items():
+            matches = remaining & dates.str.fullmatch(pattern)
+            if matches.any():
+                parsed[matches] = pd.to_datetime(
+                    dates[matches], format=date_format)
+                remaining &= ~matches
+        if remaining.any():
+            parsed[remaining] = pd.to_datetime(
+                dates[remaining], format='mixed')
+
+    season = (parsed.dt.year + (parsed.dt.month >= 9)).astype('float64')
+    return parsed, season
+
+# EVENT CATALOG
+
+# The event_ids used in the record progression, keyed by distance and stroke.
+# Relays are named in full and individual strokes use USA Swimming's codes,
+# and full stroke names (as in the top-times exports) are turned into codes
+# first, so the same catalog works for every cleaner. USA Swimming's own
+# event_id numbering is different, so it is not used for the records.
+
+EVENT_IDS = {
+    (50, 'FR'): 1, (100, 'FR'): 2, (200, 'FR'): 3, (500, 'FR'): 4,
+    (1000, 'FR'): 5, (1650, 'FR'): 6,
+    (100, 'BK'): 7, (200, 'BK'): 8,
+    (100, 'BR'): 9, (200, 'BR'): 10,
+    (100, 'FL'): 11, (200, 'FL'): 12,
+    (200, 'IM'): 13, (400, 'IM'): 14,
+    (200, 'Freestyle Relay'): 15, (400, 'Freestyle Relay'): 16,
+    (800, 'Freestyle Relay'): 17,
+    (200, 'Medley Relay'): 18, (400, 'Medley Relay'): 19,
+}
+
+STROKE_CODES = {
+    'Freestyle': 'FR', 'Backstroke': 'BK', 'Breaststroke': 'BR',
+    'Butterfly': 'FL', 'Individual Medley': 'IM',
+}
+
+EVENT_CATALOG = pd.Series(
+    list(EVENT_IDS.values()),
+    index=pd.MultiIndex.from_tuples(EVENT_IDS, names=['distance', 'stroke']),
+    name='event_id')
+
+
+# Returns the event_ids as a float64 Series aligned with df (NaN for events
+# not in the catalog) and the unknown distance/stroke pairs with row counts
+
+def lookup_event_ids(df):
+    strokes = df['stroke'].astype(str)
+    strokes = strokes.map(STROKE_CODES).fillna(strokes)
+    distances = pd.to_numeric(df['distance'], errors='coerce')
+
+    position = EVENT_CATALOG.index.get_indexer(
+        pd.MultiIndex.from_arrays([distances, strokes]))
+    found = position >= 0
+    event_ids = pd.Series(np.nan, index=df.index)
+    event_ids[found] = EVENT_CATALOG.to_numpy()[position[found]]
+
+    unknown = df.loc[~found, ['distance', 'stroke']].value_counts(
+        dropna=False).rename('rows').reset_index()
+    return event_ids, unknown
+
+# CANONICAL TEAM NAMES
+
+# Map the team names and abbreviations used across sources to one name. The
+# aliases are tried in order and the first one found anywhere in the name
+# wins, so their order matters ('Cal' comes before 'Southern Cal').
+#
+# All the aliases are compiled into one pattern with a branch per team. Each
+# branch scans the whole name for its aliases before the next branch is
+# tried, which keeps the order of precedence of checking them one by one.
+
+TEAM_NAMES = {
+    'Cal|CAL|Berkeley': 'California',
+    'Arizona St|ASU': 'Arizona State',
+    'ARIZ|ArizonaL': 'Arizona',
+    'Southern Cal|Southern Cali|USC': 'Southern California',
+    'AUB|Aub': 'Auburn',
+    'NC State|NCS': 'NC State',
+    'MICH|Michigan': 'Michigan',
+    'FLOR': 'Florida',
+    'TENN': 'Tennessee',
+    'WISC': 'Wisconsin',
+    'IU|Indiana': 'Indiana',
+    'ND|Notre Dame': 'Notre Dame',
+    'NW|Northwestern': 'Northwestern',
+    'HARV': 'Harvard',
+    'Tex|TEX': 'Texas',
+    'Virginia|UVA': 'Virginia',
+    'Stanford|STAN': 'Stanford',
+    ' Georgia|GeorgiaS|UGA': 'Georgia',
+    'Florida|Floid': 'Florida'
+}
+
+TEAM_PATTERN = re.compile('|'.join(
+    f'(?P<team{i}>.*?(?:{aliases}))' for i, aliases in enumerate(TEAM_NAMES)),
+    re.DOTALL)
+TEAM_GROUPS = {f'team{i}': team for i, team in enumerate(TEAM_NAMES.values())}
+
+# The full university names in the USA Swimming top-times exports, for the
+# teams that hold records. These are matched exactly, since the aliases
+# would also catch other schools (Florida State, Michigan State, Cal Poly).
+
+USASW_TEAM_NAMES = {
+    'Arizona State University': 'Arizona State',
+    'Auburn University': 'Auburn',
+    'Colorado State University': 'Colorado State',
+    'Harvard University': 'Harvard',
+    'Indiana University': 'Indiana',
+    'Los Angeles University of California': 'UCLA',
+    'Louisiana State University': 'LSU',
+    'North Carolina State University': 'NC State',
+    'Northwestern University': 'Northwestern',
+    'Reno University of Nevada': 'Nevada',
+    'Southern Methodist University': 'Southern Methodist',
+    'Stanford University': 'Stanford',
+    'Texas A&M University': 'Texas A&M',
+    'University of Arizona': 'Arizona',
+    'University of California Berkeley': 'California',
+    'University of Florida': 'Florida',
+    'University of Georgia': 'Georgia',
+    'University of Louisville': 'Louisville',
+    'University of Michigan': 'Michigan',
+    'University of North Carolina Chapel Hill': 'UNC',
+    'University of Notre Dame': 'Notre Dame',
+    'University of Southern California': 'Southern California',
+    'University of Tennessee': 'Tennessee',
+    'University of Texas': 'Texas',
+    'University of Virginia': 'Virginia',
+    'University of Wisconsin Madison': 'Wisconsin',
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def canonical_team_name(name, match_aliases=True):
+    if name in USASW_TEAM_NAMES:
+        return USASW_TEAM_NAMES[name]
+    if match_aliases:
+        match = TEAM_PATTERN.match(name)
+        if match:
+            return TEAM_GROUPS[match.lastgroup]
+    return name
+
+
+# Each distinct team is only looked up once and mapped back to the rows
+# through its code. Missing teams stay missing. Pass match_aliases=False for
+# the top-times exports, so only the exact USA Swimming names are renamed.
+
+def canonical_team_names(teams, match_aliases=True):
+    teams = pd.Series(teams)
+    codes, uniques = pd.factorize(teams)
+    names = np.array([canonical_team_name(team, match_aliases)
+                      for team in uniques] + [np.nan], dtype=object)
+    return pd.Series(names[codes], index=teams.index, name=teams.name)
+
+# STABLE ATHLETE IDs
+
+# Athletes that USA Swimming has no ID for get one made from a hash of their
+# name, so the same athlete gets the same ID on every run. Accents, case and
+# extra spaces are ignored. USA Swimming's IDs (and the ones assigned by hand)
+# have six or seven digits, so the hashed IDs are nine digits, from 10^8 up,
+# where they can't clash with a real one.
+
+HASHED_ID_START = 10 ** 8
+HASHED_ID_COUNT = 9 * 10 ** 8
+
+
+def athlete_name_key(name):
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    return ' '.join(name.casefold().split())
+
+
+def stable_athlete_id(name):
+    digest = hashlib.sha256(athlete_name_key(name).encode('utf-8')).digest()
+    return HASHED_ID_START + int.from_bytes(digest[:8], 'big') % HASHED_ID_COUNT
+
+# Hashed IDs for the given names, as a name -> athlete_id Series. Raises a
+# ValueError if two different names hash to the same ID, or if an ID is
+# already used by another athlete in df, since calculate_record_stats()
+# would then treat them as one athlete. Spellings of the same name (see
+# athlete_name_key()) share their ID.
+
+
+def stable_athlete_ids(names, df):
+    names = pd.unique(pd.Series(names, dtype=object))
+    keys = pd.Series([athlete_name_key(name) for name in names], index=names)
+    new_ids = pd.Series([stable_athlete_id(name) for name in names],
+                        index=names, dtype='int64')
+
+    other_athlete = ~df['name'].map(athlete_name_key, na_action='ignore').isin(keys)
+    existing_ids = df.loc[other_athlete, 'athlete_id'].dropna()
+    shared = keys.groupby(new_ids).transform('nunique') > 1
+    clashes = new_ids[shared | new_ids.isin(existing_ids)]
+    if len(clashes):
+        raise ValueError(f'Hashed athlete_ids clash with other athletes: {clashes.to_dict()}')
+    return new_ids
+
+# REMOVE DUPLICATE RECORDS
+
+# The same record often shows up more than once, from USA Swimming and from
+# one or more SwimSwam PDFs. The keys are normalized once (names ignore case
+# and spacing, times are rounded to the hundredth) and hashed, and for each
+# key the most complete row is kept: rows with the preferred columns filled
+# in (USA Swimming's meet_id and athlete_id) come first, then the rows with
+# the most columns filled in, then the first row.
+#
+# The conflict report lists every key that had duplicates, the row that was
+# kept and the columns where the duplicates disagreed.
+
+RECORD_KEY = ['name', 'time_(seconds)', 'season']
+PREFERRED_COLUMNS = ['meet_id', 'athlete_id']
+
+
+def record_keys(df, subset=RECORD_KEY):
+    keys = {}
+    for column in subset:
+        values = df[column]
+        if pd.api.types.is_float_dtype(values):
+            values = values.round(2)
+        elif not pd.api.types.is_numeric_dtype(values):
+            values = values.astype(object).where(values.isna(), values.astype(str))
+            values = values.str.strip().str.replace(
+                r'\s+', ' ', regex=True).str.casefold()
+        keys[column] = values.to_numpy()
+    return pd.DataFrame(keys)
+
+
+def deduplicate_records(df, subset=RECORD_KEY, prefer=PREFERRED_COLUMNS):
+    key_hash = pd.util.hash_pandas_object(
+        record_keys(df, subset), index=False).to_numpy()
+
+    score = df.notna().sum(axis=1).to_numpy()
+    for column in prefer:
+        if column in df.columns:
+            score = score + df[column].notna().to_numpy() * len(df.columns)
+
+    # Sort by key, then best score, then position, and keep the first of each key
+    position = np.arange(len(df))
+    order = np.lexsort((position, -score, key_hash))
+    first = np.ones(len(df), dtype=bool)
+    first[1:] = key_hash[order][1:] != key_hash[order][:-1]
+    kept = np.sort(order[first])
+
+    # Report the columns the duplicates disagree on. Rows are given by their
+    # position in df, since the index may repeat after a concat.
+    survivor = np.empty(len(df), dtype=np.int64)
+    survivor[order] = order[first][np.cumsum(first) - 1]
+    rows = np.bincount(survivor, minlength=len(df))
+    duplicated = np.flatnonzero(rows[survivor] > 1)
+    reported = np.flatnonzero(rows > 1)
+
+    conflicts = df.iloc[reported][subset].reset_index(drop=True)
+    conflicts.insert(0, 'kept', reported)
+    conflicts['rows'] = rows[reported]
+    conflicts['conflicts'] = ''
+    if len(reported):
+        dupes = df.iloc[duplicated]
+        differ = pd.DataFrame({
+            column: dupes[column].groupby(survivor[duplicated]).nunique() > 1
+            for column in df.columns if column not in subset}).reindex(reported)
+        conflicts['conflicts'] = [', '.join(differ.columns[row])
+                                  for row in differ.to_numpy()]
+
+    return df.iloc[kept].reset_index(drop=True), conflicts
+
+# READ USA SWIMMING CSV FILES
+
+# USA Swimming wraps every field in its exports as ="..." so Excel keeps
+# leading zeros. Dropping the '=' in front of each opening quote turns the
+# wrapper into ordinary CSV quoting, so the C parser strips it while it
+# tokenizes the file and can apply each column's dtype as it goes. Columns
+# that are not in usecols are never built.
+#
+# Wrapped fields are read as strings unless a dtype is given, and a wrapped
+# empty field stays '' (as it did when the wrappers were stripped cell by
+# cell) except in date columns, where it becomes NaT.
+
+def read_usasw_csv(csv_file, usecols=None, dtype=None, parse_dates=None):
+    if hasattr(csv_file, 'read'):
+        data = csv_file.read()
+    else:
+        with open(csv_file, 'rb') as f:
+            data = f.read()
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    parse_dates = parse_dates or []
+    if usecols is not None and not callable(usecols):
+        columns = set(usecols)
+        usecols = lambda column: column in columns
+
+    # An opening wrapper starts the file, a line or a field
+    data = data.replace(b',="', b',"').replace(b'\n="', b'\n"')
+    if data.startswith(b'="'):
+        data = data[1:]
+
+    return pd.read_csv(io.BytesIO(data), encoding='utf-8',
+                       usecols=usecols,
+                       dtype=defaultdict(lambda: str, dtype or {}),
+                       parse_dates=parse_dates,
+                       keep_default_na=False,
+                       na_values={column: [''] for column in parse_dates})
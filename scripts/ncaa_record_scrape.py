@@ -12,6 +12,37 @@ import sys
 import shutil
 import glob
 import time
+import json
+import hashlib
+import sqlite3
+import zlib
+import functools
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+try:
+    from scripts.clean_combined_records import merge_new_records, update_record_stats
+    from scripts.usasw_clean_data import clean_ncaa_record_data
+    from scripts.clean_utils import (parse_swim_times, normalize_dates,
+                                     canonical_team_names, deduplicate_records)
+except ModuleNotFoundError:
+    from clean_combined_records import merge_new_records, update_record_stats
+    from usasw_clean_data import clean_ncaa_record_data
+    from clean_utils import (parse_swim_times, normalize_dates,
+                             canonical_team_names, deduplicate_records)
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
 
 # GET LINKS TO PDF RESULTS FROM 2002 - 2023
 
@@ -33,40 +64,219 @@ def is_year_in_link(link, years):
 
 # COLLLECT PDF RESULTS FROM 2002 - 2023
 
+# Match each {gender}_{year}.pdf file to the link it should be downloaded from.
+# When several links match a year, the last one wins, which is the file the
+# old serial loop left on disk after overwriting the earlier downloads.
 
-def download_pdfs(years, links, late=False):
+
+def pdf_download_jobs(years, links, late=False):
     half_index = len(links) // 2
     m_links = links[:half_index]
     w_links = links[half_index:]
 
+    jobs = {}
     for year in years:
         for gender_links, gender in zip([m_links, w_links], ['M', 'W']):
+            filename = f'{gender}_{year}.pdf'
             for link in gender_links:
                 if str(year) in link:
-                    response = requests.get(link)
-                    filename = f'{gender}_{year}.pdf'
-                    with open(filename, 'wb') as f:
-                        f.write(response.content)
+                    jobs[filename] = link
                     if late:
                         break
             if late:
                 if gender == 'M' and year == 2021:
-                    link = links[2]
+                    jobs[filename] = links[2]
                 elif gender == 'M' and year == 2018:
-                    link = links[4]
+                    jobs[filename] = links[4]
                 elif gender == 'W' and year == 2018:
-                    link = links[-13]
+                    jobs[filename] = links[-13]
                 elif gender == 'W' and year == 2016:
-                    link = links[23]
+                    jobs[filename] = links[23]
                 elif gender == 'W' and year == 2015:
-                    link = links[24]
-                else:
-                    continue
+                    jobs[filename] = links[24]
+    return jobs
+
+# Create a pooled HTTP session that can be shared by all download threads
+
+
+def pdf_session(max_workers=8):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# PDF DOWNLOAD CACHE
+
+# The cache index maps each PDF link to the file it was saved as, the sha256 of
+# its contents and the ETag/Last-Modified validators the server sent with it.
+# It lives next to the PDFs in data/pdf_results so reruns can skip any file
+# whose hash still matches the copy already stored there.
+
+PDF_RESULTS_DIR = os.path.join('..', 'data', 'pdf_results')
+PDF_CACHE_FILE = os.path.join(PDF_RESULTS_DIR, 'pdf_cache.json')
+
+
+def file_sha256(filename, chunk_size=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_pdf_cache(cache_file=PDF_CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return {}
+    with open(cache_file) as f:
+        return json.load(f)
+
+
+def save_pdf_cache(cache, cache_file=PDF_CACHE_FILE):
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, cache_file)
+
+# Stream a single PDF to disk in chunks, writing to a temporary file first
+# so an interrupted download never leaves a truncated PDF behind.
+# If a cached copy with a known hash exists, the request is made conditional
+# and a 304 reuses the copy; a leftover .part file is resumed with a byte-range
+# request as long as the server still has the same version of the file, and
+# downloaded again from the start if it turns out to be complete already.
+
+
+def download_pdf(session, link, filename, entry, cached_copy=None,
+                 chunk_size=64 * 1024, timeout=60):
+    tmp_filename = filename + '.part'
+    headers = {}
+
+    if cached_copy is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    validator = entry.get('etag') or entry.get('last_modified')
+    offset = 0
+    if os.path.exists(tmp_filename) and validator:
+        offset = os.path.getsize(tmp_filename)
+        headers['Range'] = f'bytes={offset}-'
+        headers['If-Range'] = validator
+
+    with session.get(link, headers=headers, stream=True,
+                     timeout=timeout) as response:
+        if response.status_code == 304:
+            if os.path.abspath(cached_copy) != os.path.abspath(filename):
+                shutil.copyfile(cached_copy, filename)
+            return entry
+
+        # A .part file that was already complete asks for a range starting at
+        # the end of the file, so throw it away and download from the start
+        if response.status_code == 416 and offset:
+            os.remove(tmp_filename)
+            return download_pdf(session, link, filename, entry, cached_copy,
+                                chunk_size=chunk_size, timeout=timeout)
+
+        response.raise_for_status()
+
+        # Record the validators before writing, so a partial file left by an
+        # interrupted run can be resumed against the same version next time
+        entry.clear()
+        entry.update({'filename': os.path.basename(filename),
+                      'etag': response.headers.get('ETag'),
+                      'last_modified': response.headers.get('Last-Modified'),
+                      'sha256': None})
+
+        mode = 'ab' if response.status_code == 206 and offset else 'wb'
+        with open(tmp_filename, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+
+    entry['sha256'] = file_sha256(tmp_filename)
+    entry['size'] = os.path.getsize(tmp_filename)
+    os.replace(tmp_filename, filename)
+    return entry
+
+# Look up a job in the cache and decide whether the network is needed at all.
+# The link's cache entry is updated in place as the download progresses.
+
+
+def fetch_pdf(session, link, filename, cache, results_dir=PDF_RESULTS_DIR,
+              revalidate=False):
+    entry = cache.setdefault(link, {})
+    cached_copy = None
+
+    if entry.get('sha256'):
+        candidate = os.path.join(results_dir, os.path.basename(filename))
+        if os.path.exists(candidate) and \
+                file_sha256(candidate) == entry['sha256']:
+            cached_copy = candidate
+
+    if cached_copy is not None and not revalidate:
+        if os.path.abspath(cached_copy) != os.path.abspath(filename):
+            shutil.copyfile(cached_copy, filename)
+        return entry
+
+    return download_pdf(session, link, filename, entry,
+                        cached_copy=cached_copy)
+
+# Download every {filename: link} job concurrently over one pooled session.
+# Pass a cache_file to reuse the copies already in results_dir between runs;
+# the index is saved even when a download fails so partial files can resume.
+
+
+def download_pdf_files(jobs, dst_dir='.', max_workers=8, session=None,
+                       cache_file=None, results_dir=PDF_RESULTS_DIR,
+                       revalidate=False):
+    own_session = session is None
+    if own_session:
+        session = pdf_session(max_workers)
+
+    cache = load_pdf_cache(cache_file) if cache_file else {}
+    files = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for filename, link in jobs.items():
+                path = os.path.join(dst_dir, filename)
+                futures[path] = executor.submit(
+                    fetch_pdf, session, link, path, cache,
+                    results_dir=results_dir, revalidate=revalidate)
+            for path, future in futures.items():
+                future.result()
+                files.append(path)
+    finally:
+        if own_session:
+            session.close()
+        if cache_file:
+            save_pdf_cache(cache, cache_file)
+
+    return files
+
+
+# Move the PDFs in src_dir to dst_dir. A PDF that changed upstream replaces
+# the stored copy, so its hash matches the cache index again and the next
+# run doesn't download it again. Copies that are unchanged are just deleted.
+
+
+def store_results_pdfs(src_dir='.', dst_dir=PDF_RESULTS_DIR):
+    os.makedirs(dst_dir, exist_ok=True)
+    for file in glob.glob(os.path.join(src_dir, "*.pdf")):
+        dst_file = os.path.join(dst_dir, os.path.basename(file))
+        if os.path.exists(dst_file) and file_sha256(dst_file) == file_sha256(file):
+            os.remove(file)
+        else:
+            os.replace(file, dst_file)
 
-                response = requests.get(link)
-                filename = f'{gender}_{year}.pdf'
-                with open(filename, 'wb') as f:
-                    f.write(response.content)
+
+def download_pdfs(years, links, late=False, max_workers=8, session=None,
+                  cache_file=None):
+    jobs = pdf_download_jobs(years, links, late=late)
+    return download_pdf_files(jobs, max_workers=max_workers, session=session,
+                              cache_file=cache_file)
 
 # CREATE A DICTIONARY OF RESULTS FROM 2002 - 2023
 # IMPORTANT: Only running the code below will miss some 2009 women's records
@@ -75,46 +285,469 @@ def download_pdfs(years, links, late=False):
 # Then run the code below
 
 
-def results_dictionary():
+# PAGE TEXT CACHE
+
+# pdfplumber's layout analysis is by far the slowest part of parsing, and the
+# PDFs in data/pdf_results rarely change. The text of each page is stored in a
+# SQLite file keyed by the PDF's sha256, the page number and the settings
+# passed to extract_text(), so later parses can skip pdfplumber entirely.
+
+PAGE_TEXT_CACHE = os.path.join(PDF_RESULTS_DIR, 'page_text.sqlite')
+
+
+def open_page_text_cache(cache_file=PAGE_TEXT_CACHE):
+    cache_dir = os.path.dirname(cache_file)
+    if cache_dir and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    conn = sqlite3.connect(cache_file, timeout=60)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS pdf_files '
+                 '(sha256 TEXT PRIMARY KEY, page_count INTEGER)')
+    conn.execute('CREATE TABLE IF NOT EXISTS page_text '
+                 '(sha256 TEXT, page INTEGER, settings TEXT, text BLOB, '
+                 'PRIMARY KEY (sha256, page, settings))')
+    conn.execute('CREATE TABLE IF NOT EXISTS event_pages '
+                 '(sha256 TEXT, prefixes TEXT, pages TEXT, '
+                 'PRIMARY KEY (sha256, prefixes))')
+    return conn
+
+
+def page_text_settings(**extract_settings):
+    extract_settings['pdfplumber'] = pdfplumber.__version__
+    return json.dumps(extract_settings, sort_keys=True)
+
+# Yield the extract_text() output of the given pages of a PDF (all pages by
+# default) one page at a time, reading from the cache when possible and only
+# opening the PDF for pages that are missing
+
+
+def iter_page_texts(filename, cache_file=PAGE_TEXT_CACHE, pages=None,
+                    **extract_settings):
+    if cache_file is None:
+        with pdfplumber.open(filename) as pdf:
+            if pages is None:
+                pages = range(len(pdf.pages))
+            for page_number in pages:
+                page = pdf.pages[page_number]
+                text = page.extract_text(**extract_settings)
+                page.flush_cache()
+                yield text
+        return
+
+    sha256 = file_sha256(filename)
+    settings = page_text_settings(**extract_settings)
+    pdf = None
+
+    with closing(open_page_text_cache(cache_file)) as conn:
+        try:
+            row = conn.execute('SELECT page_count FROM pdf_files WHERE sha256 = ?',
+                               (sha256,)).fetchone()
+            if row is None:
+                pdf = pdfplumber.open(filename)
+                page_count = len(pdf.pages)
+                with conn:
+                    conn.execute('INSERT OR REPLACE INTO pdf_files VALUES (?, ?)',
+                                 (sha256, page_count))
+            else:
+                page_count = row[0]
+
+            if pages is None:
+                pages = range(page_count)
+
+            for page_number in pages:
+                cached = conn.execute(
+                    'SELECT text FROM page_text '
+                    'WHERE sha256 = ? AND page = ? AND settings = ?',
+                    (sha256, page_number, settings)).fetchone()
+                if cached is not None:
+                    yield zlib.decompress(cached[0]).decode('utf-8')
+                    continue
+
+                if pdf is None:
+                    pdf = pdfplumber.open(filename)
+                page = pdf.pages[page_number]
+                text = page.extract_text(**extract_settings)
+                page.flush_cache()
+                with conn:
+                    conn.execute('INSERT OR REPLACE INTO page_text VALUES (?, ?, ?, ?)',
+                                 (sha256, page_number, settings,
+                                  zlib.compress(text.encode('utf-8'))))
+                yield text
+        finally:
+            if pdf is not None:
+                pdf.close()
+
+
+def extract_page_texts(filename, cache_file=PAGE_TEXT_CACHE, pages=None,
+                       **extract_settings):
+    return list(iter_page_texts(filename, cache_file=cache_file, pages=pages,
+                                **extract_settings))
+
+# EVENT PAGE PRE-FILTER
+
+# Only pages with a line starting with one of the event prefixes can add a
+# record, so there is no need to lay out the other pages. pdfium reads the
+# plain text of a page in a few milliseconds, which is cheap enough to find
+# those pages before pdfplumber runs. The page list is cached alongside the
+# page text. If pypdfium2 is not installed, every page is laid out as before.
+
+
+def find_event_pages(filename, event_prefixes):
+    if pypdfium2 is None:
+        return None
+
+    event_prefixes = tuple(event_prefixes)
+    pages = []
+    pdf = pypdfium2.PdfDocument(filename)
+    try:
+        for page_number in range(len(pdf)):
+            page = pdf[page_number]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            if any(line.lstrip().startswith(event_prefixes)
+                   for line in text.splitlines()):
+                pages.append(page_number)
+    finally:
+        pdf.close()
+    return pages
+
+
+def event_pages(filename, event_prefixes, cache_file=PAGE_TEXT_CACHE):
+    if cache_file is None or pypdfium2 is None:
+        return find_event_pages(filename, event_prefixes)
+
+    sha256 = file_sha256(filename)
+    prefixes = json.dumps(sorted(event_prefixes))
+
+    with closing(open_page_text_cache(cache_file)) as conn:
+        row = conn.execute('SELECT pages FROM event_pages '
+                           'WHERE sha256 = ? AND prefixes = ?',
+                           (sha256, prefixes)).fetchone()
+        if row is not None:
+            return json.loads(row[0])
+
+        pages = find_event_pages(filename, event_prefixes)
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO event_pages VALUES (?, ?, ?)',
+                         (sha256, prefixes, json.dumps(pages)))
+    return pages
+
+# LINE CLASSIFIER
+
+# Compile the event and record prefixes into one regular expression that finds
+# every event or record line of a page in a single scan, skipping all other
+# lines inside the regex engine. A line that starts with prefixes from both
+# sets is tagged as both, just like checking each set separately.
+
+
+@functools.lru_cache(maxsize=None)
+def compile_line_classifier(event_prefixes, record_prefixes):
+    def alternation(prefixes):
+        return '|'.join(re.escape(prefix) for prefix in
+                        sorted(prefixes, key=len, reverse=True))
+
+    events = alternation(event_prefixes)
+    records = alternation(record_prefixes)
+    pattern = re.compile(rf'^(?={events}|{records})'
+                         rf'(?:(?={events})(?P<event>))?'
+                         rf'(?:(?={records})(?P<record>))?'
+                         r'(?P<line>[^\n]*)', re.MULTILINE)
+
+    # Yield (line, is_event, is_record) for each event or record line in text
+    def classify_lines(text):
+        for match in pattern.finditer(text):
+            yield (match.group('line'),
+                   match.start('event') != -1,
+                   match.start('record') != -1)
+
+    return classify_lines
+
+# Collect the (event, record) pairs from a single results PDF in the order
+# they are found. This lives at module level so it can run in a worker process.
+
+
+def parse_results_pdf(filename, event_prefixes, record_prefixes,
+                      cache_file=PAGE_TEXT_CACHE, prefilter=True):
+    pages = None
+    if prefilter:
+        pages = event_pages(filename, event_prefixes, cache_file=cache_file)
+
+    classify_lines = compile_line_classifier(tuple(event_prefixes),
+                                             tuple(record_prefixes))
+
+    pairs = []
+    seen_events = set()
+    seen_records = set()
+    for text in extract_page_texts(filename, cache_file=cache_file, pages=pages):
+        # The j-th event line on a page is paired with the j-th record line
+        pending_events = deque()
+        pending_records = deque()
+        for line, is_event, is_record in classify_lines(text):
+            if is_event:
+                pending_events.append(line)
+            if is_record:
+                pending_records.append(line)
+
+            while pending_events and pending_records:
+                event = pending_events.popleft()
+                record = pending_records.popleft()
+                if event not in seen_events:
+                    seen_events.add(event)
+                    if record not in seen_records:
+                        seen_records.add(record)
+                        pairs.append((event, record))
+
+        # Events without a record line on this page are still marked as seen
+        seen_events.update(pending_events)
+    return pairs
+
+# Event and record line prefixes used by the 2006 - 2023 and 2002 - 2005 results
+
+LATER_EVENT_PREFIXES = ["Event", "Men"]
+LATER_RECORD_PREFIXES = ["NCAA:", "Championship"]
+EARLY_EVENT_PREFIXES = ["EVENT"]
+EARLY_RECORD_PREFIXES = ["NCAA:", "Championship", "NCAA Record"]
+
+
+def results_dictionary(max_workers=None, cache_file=PAGE_TEXT_CACHE, prefilter=True,
+                       years=None):
+    jobs = []
+
     def process_pdf(year_range, gender_list, event_prefixes, record_prefixes, records):
         for year in year_range:
-            if year != 2020:
+            if year != 2020 and (years is None or year in years):
                 for gender in gender_list:
                     filename = f"{gender}_{year}.pdf"
-                    with pdfplumber.open(filename) as pdf:
-                        seen_events = set()
-                        seen_records = set()
-                        for page in pdf.pages:
-                            text = page.extract_text()
-                            lines = text.split('\n')
-                            event_lines = [line for line in lines if any(
-                                line.startswith(prefix) for prefix in event_prefixes)]
-                            record_lines = [line for line in lines if any(
-                                line.startswith(prefix) for prefix in record_prefixes)]
-
-                            for j, event in enumerate(event_lines):
-                                if event not in seen_events:
-                                    seen_events.add(event)
-                                    if j < len(record_lines):
-                                        record = record_lines[j]
-                                        if record not in seen_records:
-                                            seen_records.add(record)
-                                            if year not in records:
-                                                records[year] = {}
-                                            if event not in records[year]:
-                                                records[year][event] = {}
-                                            records[year][event] = record
+                    jobs.append((records, year, filename,
+                                 event_prefixes, record_prefixes))
 
     later_records = {}
     early_records = {}
 
-    process_pdf(range(2006, 2024), ['M', 'W'], ["Event", "Men"], [
-                "NCAA:", "Championship"], later_records)
-    process_pdf(range(2002, 2006), ['M', 'W'], ["EVENT"], [
-                "NCAA:", "Championship", "NCAA Record"], early_records)
+    # Seasons after 2023 use the same layout as the later results
+    later_years = range(2006, max([2023] + list(years or [])) + 1)
+    process_pdf(later_years, ['M', 'W'], LATER_EVENT_PREFIXES,
+                LATER_RECORD_PREFIXES, later_records)
+    process_pdf(range(2002, 2006), ['M', 'W'], EARLY_EVENT_PREFIXES,
+                EARLY_RECORD_PREFIXES, early_records)
+
+    # Parse the PDFs in parallel, then merge the results in submission order
+    # so the dictionaries don't depend on which worker finishes first
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(parse_results_pdf, filename,
+                                   event_prefixes, record_prefixes,
+                                   cache_file=cache_file, prefilter=prefilter)
+                   for _, _, filename, event_prefixes, record_prefixes in jobs]
+
+        for (records, year, *_), future in zip(jobs, futures):
+            for event, record in future.result():
+                if year not in records:
+                    records[year] = {}
+                records[year][event] = record
 
     return early_records, later_records
 
+# EXTRACT EVERY SWIM FROM THE RESULTS PDFs
+
+# The record scrape above only keeps one line per event. The functions below
+# walk the same PDFs page by page and yield one row per swim, so finals and
+# prelims results from 2002 - 2023 can be analyzed without any network.
+# Rows are produced by a generator and written to Parquet in batches, so only
+# one page of text and one batch of rows are held in memory at a time.
+
+EVENT_HEADER = re.compile(
+    r"(?:^|\()(?:(?:Event|EVENT:?)\s+(?P<number>\d+)\s+)?"
+    r"(?P<event>(?:Men|Women|MEN's|WOMEN's)\s+\d+\s+(?:Yard|YARD|Meter|METER)S?\s[^()]*?)"
+    r"\)?\s*$")
+
+SWIM_TIME = r"(?:\d{1,2}:)?:?\d{1,2}\.\d{2}"
+
+SWIM_LINE = re.compile(
+    r"^\*?(?P<place>\d+)\)?\s+(?P<entrant>.+?)\s+"
+    rf"(?:(?P<seed>{SWIM_TIME}|NT)[^\s\d]*\s+)?"
+    rf"(?P<time>{SWIM_TIME}|DQ|DFS|NS|SCR|DNF)(?P<flags>[^\s\d]*)"
+    r"(?:\s+\*\*|\s+\"[A-Z]\")?"
+    r"(?:\s+[qQJRX])?"
+    r"(?:\s+(?P<points>\d+(?:\.\s?\d+)?))?\s*$")
+
+REACTION_TIME = re.compile(r"^r:[+-]?\d*\.\d+\s+")
+
+SPLIT_LINE = re.compile(rf"^(?:r:[+-]?\d*\.\d+\s+)?(?:{SWIM_TIME}(?:\s+\({SWIM_TIME}\))?\s*)+$")
+
+SPLIT_TIME = re.compile(rf"(?<![(\d:.]){SWIM_TIME}(?![)\d])")
+
+CLASS_YEAR = re.compile(r"\s(?P<class>FR|SO|JR|SR|5Y|GR)(?:\s+|$)")
+
+ROUND_HEADERS = {
+    'Championship Final': 'Finals', 'CHAMPIONSHIP FINAL': 'Finals',
+    'A - Final': 'Finals', 'Consolation Final': 'Finals',
+    'CONSOLATION FINAL': 'Finals', 'B - Final': 'Finals',
+    'Preliminaries': 'Prelims', 'RESULTS of PRELIMS': 'Prelims',
+    'Swim-off': 'Swim-off', 'Swim-Off': 'Swim-off', 'SWIM-OFF': 'Swim-off',
+}
+
+
+def swim_time_to_seconds(time_string):
+    time_string = time_string.lstrip(':')
+    try:
+        if ':' in time_string:
+            minutes, seconds = time_string.split(':', 1)
+            return int(minutes) * 60 + float(seconds)
+        return float(time_string)
+    except ValueError:
+        return np.nan
+
+
+def format_swimmer_name(name):
+    if ', ' in name:
+        last, first = name.split(', ', 1)
+        name = first + ' ' + last
+    if name.isupper():
+        name = name.title()
+    return name
+
+# Turn one results line into a swim row, or return None if it isn't one
+
+
+def parse_swim_line(line, relay):
+    match = SWIM_LINE.match(line)
+    if match is None:
+        return None
+
+    entrant = match.group('entrant')
+    name, class_year, team = entrant, None, entrant
+    if relay:
+        # Skip the relay leg lines, e.g. "2) MARSHALL, PETER JR :18.93 4) ..."
+        if re.search(r'\d\)', entrant):
+            return None
+        name = team = entrant.replace("'A'", '').strip()
+    else:
+        year_match = CLASS_YEAR.search(' ' + entrant + ' ')
+        if year_match is not None:
+            name = entrant[:year_match.start()].strip()
+            class_year = year_match.group('class')
+            team = entrant[year_match.end() - 1:].strip() or None
+        else:
+            team = None
+        name = format_swimmer_name(name)
+
+    points = match.group('points')
+    time = match.group('time')
+    return {
+        'place': int(match.group('place')),
+        'name': name,
+        'class': class_year,
+        'team': team,
+        'seed_time': match.group('seed'),
+        'time_(string)': time,
+        'time_(seconds)': swim_time_to_seconds(time),
+        'points': float(points.replace(' ', '')) if points else np.nan,
+        'splits': [],
+    }
+
+# Yield one row per swim from a single results PDF
+
+
+def iter_swim_results(filename, year, gender, cache_file=PAGE_TEXT_CACHE):
+    event_number, event, relay, skip = None, None, False, True
+    round_name = 'Finals'
+    row = None
+
+    for page_number, text in enumerate(iter_page_texts(filename, cache_file=cache_file)):
+        for line in text.split('\n'):
+            line = line.strip()
+
+            header = EVENT_HEADER.search(line)
+            if header is not None:
+                if row is not None:
+                    yield row
+                    row = None
+                new_event = ' '.join(header.group('event').split())
+                if new_event != event:
+                    round_name = 'Finals'
+                event_number = header.group('number')
+                event_number = int(event_number) if event_number else None
+                event = new_event
+                relay = 'relay' in event.lower()
+                skip = 'diving' in event.lower() or 'platform' in event.lower()
+                continue
+
+            if skip:
+                continue
+
+            for header_text, header_round in ROUND_HEADERS.items():
+                if line.startswith(header_text):
+                    round_name = header_round
+
+            if row is not None and SPLIT_LINE.match(line):
+                # Leave out the reaction time, e.g. "r:+0.64", at the start
+                splits = SPLIT_TIME.findall(REACTION_TIME.sub('', line))
+                row['splits'].extend(swim_time_to_seconds(split)
+                                     for split in splits)
+                continue
+
+            swim = parse_swim_line(line, relay)
+            if swim is not None:
+                if row is not None:
+                    yield row
+                row = {'season': year, 'gender': gender,
+                       'event_number': event_number, 'event': event,
+                       'round': round_name, 'page': page_number, **swim}
+
+    if row is not None:
+        yield row
+
+
+def iter_all_swim_results(years=range(2002, 2024), genders=['M', 'W'],
+                          cache_file=PAGE_TEXT_CACHE):
+    for year in years:
+        if year == 2020:
+            continue
+        for gender in genders:
+            yield from iter_swim_results(f"{gender}_{year}.pdf", year, gender,
+                                         cache_file=cache_file)
+
+# Write swim rows to a Parquet file in batches of batch_size rows
+
+
+def write_swim_results(rows, filename, batch_size=10000):
+    if pa is None:
+        raise ImportError('pyarrow is required to write the swim results table')
+
+    schema = pa.schema([
+        ('season', pa.int16()), ('gender', pa.string()),
+        ('event_number', pa.int16()), ('event', pa.string()),
+        ('round', pa.string()), ('page', pa.int32()),
+        ('place', pa.int16()), ('name', pa.string()),
+        ('class', pa.string()), ('team', pa.string()),
+        ('seed_time', pa.string()), ('time_(string)', pa.string()),
+        ('time_(seconds)', pa.float64()), ('points', pa.float64()),
+        ('splits', pa.list_(pa.float64())),
+    ])
+
+    total = 0
+    with pq.ParquetWriter(filename, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                total += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            total += len(batch)
+    return total
+
+
+def build_swim_results(filename=os.path.join('..', 'data', 'swim_results.parquet'),
+                       years=range(2002, 2024), cache_file=PAGE_TEXT_CACHE):
+    rows = iter_all_swim_results(years=years, cache_file=cache_file)
+    return write_swim_results(rows, filename)
+
 # REMOVE PDFs FROM DIRECTORY
 
 
@@ -221,19 +854,7 @@ def clean_early_records(dictionary):
     df['name'] = df['name'].fillna(df['team'])
 
     # Convert time to seconds in a new column
-    for i in range(len(df)):
-        if len(df.loc[i, 'time_(string)']) == 5:
-            df.loc[i, 'time_(seconds)'] = float(df.loc[i, 'time_(string)'])
-        elif len(df.loc[i, 'time_(string)']) == 7:
-            df.loc[i, 'time_(seconds)'] = \
-                float(df.loc[i, 'time_(string)'][:1])*60 + \
-                float(df.loc[i, 'time_(string)'][2:4]) +\
-                float(df.loc[i, 'time_(string)'][5:])/100
-        elif len(df.loc[i, 'time_(string)']) == 8:
-            df.loc[i, 'time_(seconds)'] = \
-                float(df.loc[i, 'time_(string)'][:2])*60 + \
-                float(df.loc[i, 'time_(string)'][3:5]) +\
-                float(df.loc[i, 'time_(string)'][6:])/100
+    df['time_(seconds)'], _ = parse_swim_times(df['time_(string)'])
 
     # Remove rows with the same name, event, time_(seconds), and season
     df = df.drop_duplicates(
@@ -293,9 +914,8 @@ def clean_early_records(dictionary):
     df = df.drop(['year', 'event', 'record'], axis=1)
 
     # Drop observations that have the same name, team, and time
-    df.drop_duplicates(
-        subset=['name', 'team', 'time_(seconds)', 'season'], inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    df, _ = deduplicate_records(
+        df, subset=['name', 'team', 'time_(seconds)', 'season'])
 
     columns = ['name', 'distance', 'stroke', 'course',
                'time_(string)', 'time_(seconds)', 'season', 'date', 'team', 'gender']
@@ -373,7 +993,10 @@ def clean_later_records(dictionary):
     df['course'] = 'SCY'
 
     # Drop rows Auburn relay assigned to non-relay event
-    df.drop([247, 283], inplace=True)
+    # (a relay record has no athlete name, so it splits into fewer fields)
+    misassigned = ~df['stroke'].str.contains('Relay', na=False) & \
+        (df['record'].str.split(' ').str.len() < 5)
+    df = df[~misassigned]
     df.reset_index(drop=True, inplace=True)
 
     # Split up record column into time, date, and team columns
@@ -414,40 +1037,8 @@ def clean_later_records(dictionary):
     # Rename 'S California' to 'Southern California'
     df['team'] = df['team'].str.replace('S California', 'Southern California')
 
-    team_dict = {
-        'Cal|CAL|Berkeley': 'California',
-        'Arizona St|ASU': 'Arizona State',
-        'ARIZ|ArizonaL': 'Arizona',
-        'Southern Cal|Southern Cali|USC': 'Southern California',
-        'AUB|Aub': 'Auburn',
-        'NC State|NCS': 'NC State',
-        'MICH|Michigan': 'Michigan',
-        'FLOR': 'Florida',
-        'TENN': 'Tennessee',
-        'WISC': 'Wisconsin',
-        'IU|Indiana': 'Indiana',
-        'ND|Notre Dame': 'Notre Dame',
-        'NW|Northwestern': 'Northwestern',
-        'HARV': 'Harvard',
-        'Tex|TEX': 'Texas',
-        'Virginia|UVA': 'Virginia',
-        'Stanford|STAN': 'Stanford',
-        ' Georgia|GeorgiaS|UGA': 'Georgia',
-        'Florida|Floid': 'Florida'
-    }
-
-    # Create regular expression patterns for each team name
-    patterns = {re.compile(key): value for key, value in team_dict.items()}
-
-    # Function to map team names to team IDs using regular expressions
-    def map_team_name(name):
-        for pattern, team in patterns.items():
-            if pattern.search(name):
-                return team
-        return name
-
-    # Apply the map_team_name function to the 'team' column to create a new 'team_id' column
-    df['team'] = df['team'].apply(map_team_name)
+    # Map every team name and abbreviation to one name
+    df['team'] = canonical_team_names(df['team'])
 
     # Correct Texas A&M team name
     index = df[df['name'] == 'Breeja Larson'].index
@@ -469,49 +1060,10 @@ def clean_later_records(dictionary):
         lambda x: 'Arianna Vanderpool-Wallace' if x == 'Ariana Vanderpool-Wallace' else x)
 
     # Convert time to seconds
-    for i in range(len(df)):
-        if len(df.loc[i, 'time_(string)']) == 5:
-            df.loc[i, 'time_(seconds)'] = float(df.loc[i, 'time_(string)'])
-        elif len(df.loc[i, 'time_(string)']) == 7:
-            df.loc[i, 'time_(seconds)'] = \
-                float(df.loc[i, 'time_(string)'][:1])*60 + \
-                float(df.loc[i, 'time_(string)'][2:4]) +\
-                float(df.loc[i, 'time_(string)'][5:])/100
-        elif len(df.loc[i, 'time_(string)']) == 8:
-            df.loc[i, 'time_(seconds)'] = \
-                float(df.loc[i, 'time_(string)'][:2])*60 + \
-                float(df.loc[i, 'time_(string)'][3:5]) +\
-                float(df.loc[i, 'time_(string)'][6:])/100
-
-    # Convert date to datetime object
-
-    months = {
-        'Jan': '01', 'Feb': '02', 'Mar': '03',
-        'Apr': '04', 'May': '05', 'Jun': '06',
-        'Jul': '07', 'Aug': '08', 'Sep': '09',
-        'Oct': '10', 'Nov': '11', 'Dec': '12'
-    }
+    df['time_(seconds)'], _ = parse_swim_times(df['time_(string)'])
 
-    for i in range(len(df)):
-        if len(df.loc[i, 'date']) == 4:
-            df.loc[i, 'date'] = '01/01/' + df.loc[i, 'date']
-            df.loc[i, 'date'] = pd.to_datetime(df.loc[i, 'date'])
-        elif '-' in df.loc[i, 'date']:
-            day, month, year = df.loc[i, 'date'].split('-')
-            month = months[month]
-            df.loc[i, 'date'] = month + '/' + day + '/' + year
-            df.loc[i, 'date'] = pd.to_datetime(df.loc[i, 'date'])
-        else:
-            df.loc[i, 'date'] = pd.to_datetime(df.loc[i, 'date'])
-
-    df['date'] = pd.to_datetime(df['date'])
-
-    # Create a column for the season
-    for i in range(len(df)):
-        if df.loc[i, 'date'].month < 9:
-            df.loc[i, 'season'] = df.loc[i, 'date'].year
-        else:
-            df.loc[i, 'season'] = df.loc[i, 'date'].year + 1
+    # Convert date to datetime object and create a column for the season
+    df['date'], df['season'] = normalize_dates(df['date'])
 
     # Drop observations that have the string 'Krug' or 'Loukas' in the record column
     # These are inaccurate observations
@@ -520,9 +1072,8 @@ def clean_later_records(dictionary):
     df.reset_index(drop=True, inplace=True)
 
     # Drop observations that have the same name, team, and time
-    df.drop_duplicates(
-        subset=['name', 'team', 'time_(seconds)', 'season'], inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    df, _ = deduplicate_records(
+        df, subset=['name', 'team', 'time_(seconds)', 'season'])
 
     df.drop(['year', 'event', 'record'], axis=1, inplace=True)
 
@@ -538,7 +1089,7 @@ def clean_later_records(dictionary):
 # SCRAPE AND CLEAN NCAA RECORDS FROM 2002-2023 ON SWIMSWAM.COM
 
 
-def scrape_ncaa_reocrds():
+def scrape_ncaa_reocrds(max_workers=8, revalidate=False):
 
     url = 'https://swimswam.com/swimswam-meet-results-archive/'
     response = requests.get(url)
@@ -568,16 +1119,21 @@ def scrape_ncaa_reocrds():
     # COLLECT PDF RESULTS FROM 2002 - 2006
     early_years = list(range(2002, 2006))
     early_years.reverse()
-    download_pdfs(early_years, early_links)
+    jobs = pdf_download_jobs(early_years, early_links)
 
     # COLLECT PDF RESULTS FROM 2006 - 2023
     later_years = list(range(2006, 2024))
     later_years.remove(2020)
     later_years.reverse()
-    download_pdfs(later_years, pdf_links, late=True)
+    jobs.update(pdf_download_jobs(later_years, pdf_links, late=True))
+
+    # Skip the 2009 women's file since we will use a different one from the repository
+    jobs.pop('W_2009.pdf', None)
 
-    # Remove 2009 file since we will use a different one from the repository
-    os.remove('W_2009.pdf')
+    # Download the men's and women's PDFs for all seasons at once, reusing
+    # any file whose hash matches the copy already in data/pdf_results
+    download_pdf_files(jobs, max_workers=max_workers,
+                       cache_file=PDF_CACHE_FILE, revalidate=revalidate)
 
     # Move the W_2009.pdf file from the data/pdf_results directory to the current directory
     try:
@@ -602,30 +1158,122 @@ def scrape_ncaa_reocrds():
             [early_recordsdf, later_recordsdf], ignore_index=True)
 
         # Remove duplicates with the same name, distance, stroke, time_(seconds), and season
-        recordsdf.drop_duplicates(
-            subset=['name', 'distance', 'stroke', 'time_(seconds)', 'season'], inplace=True)
-        recordsdf.reset_index(drop=True, inplace=True)
-
-        # Define source and destination directories
-        src_dir = os.getcwd()  # Current working directory
-        dst_dir = os.path.join(src_dir, '../data', 'pdf_results')
-
-        # Check if the destination directory exists, if not, create it
-        if not os.path.exists(dst_dir):
-            os.makedirs(dst_dir)
+        recordsdf, _ = deduplicate_records(
+            recordsdf, subset=['name', 'distance', 'stroke', 'time_(seconds)', 'season'])
 
         # Move all pdf files to the data folder
-        for file in glob.glob(os.path.join(src_dir, "*.pdf")):
-            file_name = os.path.basename(file)
-            dst_file = os.path.join(dst_dir, file_name)
-
-            if os.path.exists(dst_file):
-                os.remove(file)  # Delete the file from the current directory
-            else:
-                # Move the file to the destination directory
-                shutil.move(file, dst_dir)
+        store_results_pdfs(os.getcwd(), os.path.join(os.getcwd(), '../data', 'pdf_results'))
 
     else:
         print('W_2009.pdf file not found in the current directory')
 
     return recordsdf
+
+# UPDATE THE RECORD PROGRESSION WITH NEW SEASONS
+
+# Rather than scraping every season again, an update only downloads and parses
+# the championship PDFs (and USA Swimming export rows) for seasons that are not
+# listed in the manifest yet, merges those records into the finished
+# ncaa_record_progression.csv, and recalculates the stats for the event/gender
+# groups that received new records.
+
+RECORD_PROGRESSION_FILE = os.path.join('..', 'ncaa_record_progression.csv')
+SEASON_MANIFEST_FILE = os.path.join('..', 'data', 'ingested_seasons.json')
+
+
+def load_season_manifest(manifest_file=SEASON_MANIFEST_FILE):
+    if not os.path.exists(manifest_file):
+        return {'seasons': []}
+    with open(manifest_file) as f:
+        return json.load(f)
+
+
+def save_season_manifest(manifest, manifest_file=SEASON_MANIFEST_FILE):
+    manifest['seasons'] = sorted(set(manifest['seasons']))
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, manifest_file)
+
+# Match the new seasons to their men's and women's PDF links on SwimSwam.
+# Seasons that are missing either PDF are left out so they can be retried.
+
+
+def season_pdf_jobs(years):
+    url = 'https://swimswam.com/swimswam-meet-results-archive/'
+    response = requests.get(url)
+    soup = BeautifulSoup(response.text, 'html.parser')
+
+    mens_pdf_links = extract_pdf_links(soup, "NCAA DI Championships (Men's)")
+    womens_pdf_links = extract_pdf_links(soup, "NCAA DI Championships (Women)")
+
+    jobs = {}
+    for year in years:
+        year_jobs = {}
+        for gender_links, gender in zip([mens_pdf_links, womens_pdf_links], ['M', 'W']):
+            for link in gender_links:
+                if str(year) in link:
+                    year_jobs[f'{gender}_{year}.pdf'] = link
+        if len(year_jobs) == 2:
+            jobs.update(year_jobs)
+        else:
+            print(f'Championship PDFs for {year} not found.')
+    return jobs
+
+
+def update_ncaa_records(seasons, usasw_file=None,
+                        progression_file=RECORD_PROGRESSION_FILE,
+                        manifest_file=SEASON_MANIFEST_FILE,
+                        max_workers=8, cache_file=PAGE_TEXT_CACHE):
+    manifest = load_season_manifest(manifest_file)
+    df = pd.read_csv(progression_file)
+
+    new_seasons = sorted(set(seasons) - set(manifest['seasons']))
+    if not new_seasons:
+        return df
+
+    # COLLECT THE NEW SEASONS' RECORDS
+
+    jobs = season_pdf_jobs(new_seasons)
+    download_pdf_files(jobs, max_workers=max_workers,
+                       cache_file=PDF_CACHE_FILE)
+    pdf_seasons = sorted({int(filename[2:6]) for filename in jobs})
+
+    frames = []
+    early_records, later_records = {}, {}
+    if pdf_seasons:
+        early_records, later_records = results_dictionary(
+            max_workers=max_workers, cache_file=cache_file, years=pdf_seasons)
+        if early_records:
+            frames.append(clean_early_records(early_records))
+        if later_records:
+            frames.append(clean_later_records(later_records))
+
+    # USA Swimming exports cover every season, so only keep the new ones
+    if usasw_file is not None:
+        usasw_records = clean_ncaa_record_data(usasw_file)
+        frames.append(
+            usasw_records[usasw_records['season'].isin(new_seasons)])
+
+    # Move the new PDFs to the data folder
+    for filename in jobs:
+        if os.path.exists(filename):
+            shutil.move(filename, os.path.join(PDF_RESULTS_DIR, filename))
+
+    # MERGE THE NEW RECORDS AND UPDATE THE STATS
+
+    if frames:
+        new_records = pd.concat(frames, ignore_index=True)
+        df, groups = merge_new_records(df, new_records)
+        df = update_record_stats(df, groups)
+        df.to_csv(progression_file, index=False)
+
+    # Only seasons whose PDFs were actually read count as ingested. A season
+    # without them is left out so it is retried next time; its USA Swimming
+    # rows are already in the progression by then and are not added twice.
+    ingested = {int(year) for records in [early_records, later_records]
+                for year, events in records.items() if events}
+    manifest['seasons'] = manifest['seasons'] + sorted(ingested)
+    save_season_manifest(manifest, manifest_file)
+
+    return df
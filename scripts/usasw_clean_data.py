@@ -10,28 +10,28 @@ import pandas as pd
 import numpy as np
 import re
 
+try:
+    from scripts.clean_utils import parse_swim_times, normalize_dates, read_usasw_csv
+except ModuleNotFoundError:
+    from clean_utils import parse_swim_times, normalize_dates, read_usasw_csv
+
 # Clean NCAA record data
 
 
 def clean_ncaa_record_data(csv_file):
 
-    # Read in data
-    df = pd.read_csv(csv_file)
-
-    # Remove the '=' and '"' from the column names
-    df = df.applymap(lambda x: x.strip('=') if isinstance(x, str) else x)
-    df = df.applymap(lambda x: x.strip('"') if isinstance(x, str) else x)
-    df.columns = df.columns.str.strip('=')
-    df.columns = df.columns.str.strip('"')
+    # Read in only the columns we keep, with the '=' and '"' wrappers removed
+    # and the IDs, codes and dates typed as the file is parsed
+    columns = ['gender', 'event_id', 'distance', 'stroke_code', 'course_code',
+               'swim_time', 'PersonId', 'full_name_computed', 'AthleteOrgUnitId',
+               'lsc_id', 'club_code', 'meet_name', 'MeetId', 'swim_date',
+               'session_desc']
+    dtypes = {'event_id': 'int64', 'distance': 'int64',
+              'PersonId': 'int64', 'AthleteOrgUnitId': 'int64', 'MeetId': 'int64',
+              'gender': 'category', 'stroke_code': 'category', 'course_code': 'category'}
 
-    # Remove unncessary columns
-    df = df.drop(
-        ["description", "record_tracking_list_display_format_id",
-         "age_group_desc", "RecordAgeGroupId", 'RANK',
-         "record_tracking_list_event_id", "location_country_code",
-         "country_code",  "disable_name_swapping_yn", "location",
-         "relay_lead_yn", "bios_display_swap_first_last_name_yn",
-         'individual_time_id'], axis=1)
+    df = read_usasw_csv(csv_file, usecols=columns, dtype=dtypes,
+                        parse_dates=['swim_date'])
 
     # Rename columns
     new_names = {'swim_time': 'time_(string)',
@@ -49,30 +49,11 @@ def clean_ncaa_record_data(csv_file):
 
     df = df.rename(columns=new_names)
 
-    # Change date data type
-    df['date'] = pd.to_datetime(df['date'])
-
-    # Create a column for the season
-    for i in range(len(df)):
-        if df.loc[i, 'date'].month < 9:
-            df.loc[i, 'season'] = df.loc[i, 'date'].year
-        else:
-            df.loc[i, 'season'] = df.loc[i, 'date'].year + 1
+    # Change date data type and create a column for the season
+    df['date'], df['season'] = normalize_dates(df['date'])
 
     # Convert time to seconds in a new column
-    for i in range(len(df)):
-        if len(df.loc[i, 'time_(string)']) == 5:
-            df.loc[i, 'time_(seconds)'] = float(df.loc[i, 'time_(string)'])
-        elif len(df.loc[i, 'time_(string)']) == 7:
-            df.loc[i, 'time_(seconds)'] = \
-                float(df.loc[i, 'time_(string)'][:1])*60 + \
-                float(df.loc[i, 'time_(string)'][2:4]) +\
-                float(df.loc[i, 'time_(string)'][5:])/100
-        elif len(df.loc[i, 'time_(string)']) == 8:
-            df.loc[i, 'time_(seconds)'] = \
-                float(df.loc[i, 'time_(string)'][:2])*60 + \
-                float(df.loc[i, 'time_(string)'][3:5]) +\
-                float(df.loc[i, 'time_(string)'][6:])/100
+    df['time_(seconds)'], _ = parse_swim_times(df['time_(string)'])
 
     # Reorder columns
     new_order = ['name', 'distance',
@@ -90,30 +71,13 @@ def clean_ncaa_record_data(csv_file):
     # Remove incomplete string from lsc_id
     df['conference'] = df['conference'].str[:-3]
 
-    # Convert distance to integer
-    df['distance'] = df['distance'].astype(int)
-
-    # Convert IDs to integers
-    df['event_id'] = df['event_id'].astype(int)
-    df['team_id'] = df['team_id'].astype(int)
-    df['meet_id'] = df['meet_id'].astype(int)
-    df['athlete_id'] = df['athlete_id'].astype(int)
-
-    # Convert distance to integer
-    df['distance'] = df['distance'].astype(int)
-
     # Remove rows that share a meet_id, athlete_id, and event_id
     df = df.drop_duplicates(
         subset=['meet_id', 'athlete_id', 'event_id'], keep='first').reset_index(drop=True)
 
     # Sort the dataframe by event_id, gender, and time in ascending order
-    df = df.sort_values(['event_id', 'gender', 'time_(seconds)'])
-
-    # Calculate the time difference between consecutive df within each event/gender group
-    time_diff = df.groupby(['event_id', 'gender'])['time_(seconds)'].diff()
-    time_diff = time_diff.fillna(0)
-    time_diff = time_diff[1:]
-    time_diff = pd.concat([time_diff, pd.Series([np.nan])], ignore_index=True)
+    df = df.sort_values(
+        ['event_id', 'gender', 'time_(seconds)']).reset_index(drop=True)
 
     return df
 
@@ -121,21 +85,16 @@ def clean_ncaa_record_data(csv_file):
 
 
 def clean_ncaa_swimming_data(csv_file):
-    df = pd.read_csv(csv_file)
-
-    # Remove the '=' and '"' from the column names
-    df = df.applymap(lambda x: x.strip('=') if isinstance(x, str) else x)
-    df = df.applymap(lambda x: x.strip('"') if isinstance(x, str) else x)
-    df.columns = df.columns.str.strip('=')
-    df.columns = df.columns.str.strip('"')
-
-    # Remove unncessary columns
-    df = df.drop(["team_code", "converted_time_flag",
-                  "alt_adjust_flag", "elig_period_code",
-                  "standard_name", "RANK",
-                  "full_desc_intl", "fina_points",
-                  "country_code", "meet_city",
-                  "time_is_for_ineligible_secondary_team_yn"], axis=1)
+
+    # Read in only the columns we keep, with the '=' and '"' wrappers removed
+    # and the IDs and dates typed as the file is parsed
+    columns = ['full_desc', 'swim_time_as_time', 'swim_time', 'swim_time_sec',
+               'swim_date', 'team_short_name', 'full_name_computed', 'meet_name',
+               'birth_date', 'event_id']
+    dtypes = {'event_id': 'int64', 'swim_time_sec': 'float64'}
+
+    df = read_usasw_csv(csv_file, usecols=columns, dtype=dtypes,
+                        parse_dates=['swim_date', 'birth_date'])
 
     # Rename columns
     new_names = {'full_desc': 'event',
@@ -153,47 +112,32 @@ def clean_ncaa_swimming_data(csv_file):
     df['time_(HH:MM:SS)'] = pd.to_timedelta(df['time_(HH:MM:SS)'])
     df['time_(seconds)'] = df['time_(HH:MM:SS)'] / pd.Timedelta(seconds=1)
 
-    # Change date data type
-    df['date'] = pd.to_datetime(df['date'])
-    df['birth_date'] = pd.to_datetime(df['birth_date'])
-
-    # Create a column for the season
-    for i in range(len(df)):
-        if df.loc[i, 'date'].month < 9:
-            df.loc[i, 'season'] = df.loc[i, 'date'].year
-        else:
-            df.loc[i, 'season'] = df.loc[i, 'date'].year + 1
-
-    # Split event into distance and stroke
-    for i in range(len(df)):
-        split_values = df['event'][i].split(' ')
-        if len(split_values) == 4:
-            df.loc[i, 'distance'] = split_values[0]
-            df.loc[i, 'stroke'] = split_values[1]
-            df.loc[i, 'course'] = split_values[2]
-            df.loc[i, 'gender'] = split_values[3]
-        elif len(split_values) == 5:
-            df.loc[i, 'distance'] = split_values[0]
-            df.loc[i, 'stroke'] = split_values[1] + ' ' + split_values[2]
-            df.loc[i, 'course'] = split_values[3]
-            df.loc[i, 'gender'] = split_values[4]
-
-    # Convert event_id to integer
-    df['event_id'] = df['event_id'].astype(int)
-
-    # Reorder the text in the name column
-    for i in range(len(df)):
-        split_name = df['name'][i].split(', ')
-        df.loc[i, 'name'] = split_name[1] + ' ' + split_name[0]
-        split_school = df['team'][i].split(', ')
-        if len(split_school) == 2:
-            df.loc[i, 'team'] = split_school[1] + \
-                ' ' + split_school[0]
-        elif len(split_school) == 3:
-            df.loc[i, 'team'] = split_school[1] + \
-                ' ' + split_school[0] + ' ' + split_school[2]
-        else:
-            df.loc[i, 'team'] = split_school[0]
+    # Change date data type and create a column for the season
+    df['date'], df['season'] = normalize_dates(df['date'])
+
+    # Split event into distance and stroke, where the stroke is two words
+    # long ('Individual Medley', 'Freestyle Relay') when the event has 5 parts
+    split_values = df['event'].str.split(' ', expand=True).reindex(
+        columns=range(5))
+    parts = df['event'].str.count(' ') + 1
+    four, five = parts == 4, parts == 5
+    df['distance'] = split_values[0].where(four | five)
+    df['stroke'] = split_values[1].where(four).fillna(
+        (split_values[1] + ' ' + split_values[2]).where(five))
+    df['course'] = split_values[2].where(four).fillna(split_values[3].where(five))
+    df['gender'] = split_values[3].where(four).fillna(split_values[4].where(five))
+
+    # Reorder the text in the name column ('Last, First' to 'First Last'),
+    # and the team column ('Texas, University of' to 'University of Texas')
+    split_name = df['name'].str.split(', ', expand=True)
+    df['name'] = split_name[1] + ' ' + split_name[0]
+
+    split_school = df['team'].str.split(', ', expand=True).reindex(
+        columns=range(3))
+    school_parts = df['team'].str.count(', ') + 1
+    df['team'] = split_school[0].mask(
+        school_parts == 2, split_school[1] + ' ' + split_school[0]).mask(
+        school_parts == 3, split_school[1] + ' ' + split_school[0] + ' ' + split_school[2])
 
     # Reorder columns
     new_order = ['name', 'event', 'distance', 'stroke', 'course', 'gender',
@@ -211,10 +155,7 @@ def clean_ncaa_swimming_data(csv_file):
                     '200 Medley Relay', '400 Medley Relay',
                     '200 Freestyle Relay', '400 Freestyle Relay', '800 Freestyle Relay']
 
-    for i in range(len(df)):
-        event = df['distance'][i] + ' ' + df['stroke'][i]
-        if event not in valid_events:
-            df = df.drop(i)
+    df = df[(df['distance'] + ' ' + df['stroke']).isin(valid_events)].copy()
 
     df['distance'] = df['distance'].astype(int)
 
@@ -231,7 +172,8 @@ def calculate_record_stats(df):
         subset=['meet_id', 'athlete_id', 'event_id'], keep='first').reset_index(drop=True)
 
     # Sort the dataframe by event_id, gender, and time in ascending order
-    df = df.sort_values(['event_id', 'gender', 'time_(seconds)'])
+    df = df.sort_values(
+        ['event_id', 'gender', 'time_(seconds)']).reset_index(drop=True)
 
     # Calculate the time difference between consecutive df within each event/gender group
     time_diff = df.groupby(['event_id', 'gender'])['time_(seconds)'].diff()
@@ -249,45 +191,19 @@ def calculate_record_stats(df):
     # Add the record_broken_by column to the dataframe
     df['record_broken_by'] = time_diff
 
-    # Initialize a dictionary to keep track of the new values for each athlete and event combination
-    total_improvement = {}
-
-    for i in range(len(df)):
-        # Get the current athlete and event IDs
-        record_sum = df.loc[i, 'record_broken_by']
-        athlete_id = df.loc[i, 'athlete_id']
-        event_id = df.loc[i, 'event_id']
-
-        # Check if the current observation has a record_broken_by value
-        if np.isnan(record_sum):
-            pass
-        else:
-
-            # Calculate the record improvement percentage
-            df.loc[i, 'record_improvement_%'] = (
-                record_sum/df.loc[i+1, 'time_(seconds)'])*100
-
-            # Check if the current athlete and event combination already has a record_sum
-            if (athlete_id, event_id) not in total_improvement:
-                # Calculate the sum of record_broken_by for the current athlete and event IDs
-                new_record_holder_sum = df[(df['athlete_id'] == athlete_id) & (
-                    df['event_id'] == event_id)]['record_broken_by'].sum()
-                total_improvement[(athlete_id, event_id)
-                                  ] = new_record_holder_sum
-            else:
-                # Use the existing record_sum for the current athlete and event combination
-                new_record_holder_sum = total_improvement[(
-                    athlete_id, event_id)]
-
-            # Update the new_record_holder_broken_by column in the first observation for the athlete and event combination
-            if i == df[(df['athlete_id'] == athlete_id) & (df['event_id'] == event_id)].index[0]:
-                df.loc[i, 'new_record_holder_broken_by'] = new_record_holder_sum
-                df.loc[i, 'new_record_holder_improvement_%'] = (
-                    new_record_holder_sum/((df.loc[i+1, 'time_(seconds)'])+new_record_holder_sum))*100
-
-            else:
-                # Set the remaining values to NaN
-                df.loc[i, 'new_record_holder_broken_by'] = np.nan
-                df.loc[i, 'new_record_holder_improvement_%'] = np.nan
+    # Each record is compared with the record it broke, which is the next row
+    next_time = df['time_(seconds)'].shift(-1)
+    df['record_improvement_%'] = (df['record_broken_by']/next_time)*100
+
+    # A record holder's improvement in an event is the sum of every record they
+    # broke in it, shown on their fastest record only
+    holder_sum = df.groupby(['athlete_id', 'event_id'])[
+        'record_broken_by'].transform('sum')
+    first_record = ~df.duplicated(['athlete_id', 'event_id']) & df['athlete_id'].notna()
+    new_holder = df['record_broken_by'].notna() & first_record
+
+    df['new_record_holder_broken_by'] = holder_sum.where(new_holder)
+    df['new_record_holder_improvement_%'] = (
+        holder_sum/(next_time+holder_sum)*100).where(new_holder)
 
     return df
@@ -11,9 +11,24 @@
 
 # Example: get_ncaa_swimming_data(2010, 2011, 10) will collect the top 10 swimmers per event for the 2010-2011 season
 
+# Chrome is only started when a report is first requested. To fetch several seasons with one browser, open a
+# BrowserSession and pass it to each call:
+#     with BrowserSession() as session:
+#         for year in range(2012, 2024):
+#             get_NCAA_results(16, year, session=session)
+# get_NCAA_results_batch() fetches many seasons at once on a pool of browsers.
+# run_backfill() keeps track of a long backfill on disk so it can be stopped and resumed.
+
 # Import libraries
 import os
+import json
 import time
+import heapq
+import queue
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
@@ -24,35 +39,222 @@ from selenium.webdriver.support import expected_conditions as EC
 import pandas as pd
 import numpy as np
 
-from scripts.usasw_clean_data import clean_ncaa_swimming_data
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+try:
+    from scripts.usasw_clean_data import clean_ncaa_swimming_data
+except ModuleNotFoundError:
+    from usasw_clean_data import clean_ncaa_swimming_data
+
+USASW_URL = 'https://www.usaswimming.org'
+REPORT_PAGE_PATH = '/times/otherorganizations/ncaa-division-i/top-times-report'
+
+# Headless Chrome session
+
+# The driver is created the first time it is used and reused by every report
+# fetched through the session. Leaving the with block (or calling close())
+# shuts Chrome down, even if a fetch failed. Reports are downloaded to
+# download_dir, or to the current working directory if it is not set.
+# get_NCAA_results() only uses download_dir, download_report() and close(),
+# so any object with those can be passed in place of a BrowserSession.
+
+
+class BrowserSession:
+
+    def __init__(self, headless=True, download_dir=None):
+        self.headless = headless
+        self.download_dir = download_dir
+        self._driver = None
 
-# Set up the Chrome driver
-chrome_options = Options()
-chrome_options.add_argument("--headless")  # Use headless mode
-chrome_options.add_argument("window-size=1920x1080")  # Set the window size
-driver = webdriver.Chrome(options=chrome_options)
+    def chrome_options(self):
+        chrome_options = Options()
+        if self.headless:
+            chrome_options.add_argument("--headless")  # Use headless mode
+        chrome_options.add_argument("window-size=1920x1080")  # Set the window size
+        if self.download_dir is not None:
+            os.makedirs(self.download_dir, exist_ok=True)
+            chrome_options.add_experimental_option('prefs', {
+                'download.default_directory': os.path.abspath(self.download_dir),
+                'download.prompt_for_download': False,
+            })
+        return chrome_options
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = webdriver.Chrome(options=self.chrome_options())
+        return self._driver
+
+    # Send the next downloads to another directory without restarting Chrome
+    def download_to(self, directory):
+        self.driver.execute_cdp_cmd('Browser.setDownloadBehavior', {
+            'behavior': 'allow', 'downloadPath': os.path.abspath(directory)})
+
+    # Fill out the report form and download the CSV into job_dir
+    def download_report(self, top_n, start_year, end_year, job_dir):
+        driver = self.driver
+        driver.get(USASW_URL + REPORT_PAGE_PATH)
+
+        try:
+            # Check if consent button exists and click it
+            consent_button = driver.find_element(
+                By.XPATH, "//button[contains(@class, 'fc-cta-consent')]")
+            consent_button.click()
+        except NoSuchElementException:
+            # Consent button does not exist, continue with script
+            pass
+
+        # Wait for the page to load by waiting for the presence of the dropdown menu
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.ID, "Times_SecondaryOrgTopTimes_Index_Div_1ddlDateRanges")))
+
+        fill_out_form(driver, start_year, end_year, top_n)
+
+        # Click "Find Times"
+        find_times_button = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.ID, "saveButton")))
+        find_times_button.click()
+
+        # Select the "Csv" option
+        output_types_dropdown = WebDriverWait(driver, 120).until(
+            EC.element_to_be_clickable((By.ID, "OutputTypes")))
+        output_types_dropdown.click()
+
+        csv_option = driver.find_element(
+            By.XPATH, "//select[@id='OutputTypes']/option[@value='Csv']")
+        csv_option.click()
+
+        self.download_to(job_dir)
+        with DownloadWatcher(job_dir) as watcher:
+            # Click the download button
+            image_element = driver.find_element(
+                By.XPATH, "//div[@class='usas-reports-reportviewer-outer-top-right']/img")
+            image_element.click()
+
+            return watcher.wait(timeout=30)
+
+    def close(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            finally:
+                self._driver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Wait for a download to finish
+
+# Each report is downloaded into a directory of its own, which is watched for
+# filesystem events (with watchdog, or by checking every tenth of a second if
+# it isn't installed). The file counts as finished once it exists, Chrome has
+# no partial .crdownload file left, and its size has stopped changing.
+
+DOWNLOAD_POLL_INTERVAL = 0.1
+
+
+class DownloadEvents:
+
+    def __init__(self):
+        self.changed = threading.Event()
+
+    # Called by the watchdog observer for every event in the directory
+    def dispatch(self, event):
+        self.changed.set()
+
+
+class DownloadWatcher:
+
+    def __init__(self, directory, filename="Report.csv"):
+        self.directory = directory
+        self.filename = os.path.join(directory, filename)
+        self.events = DownloadEvents()
+        self.observer = None
+
+    def __enter__(self):
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(self.events, self.directory)
+            self.observer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+
+    def finished_size(self):
+        if not os.path.isfile(self.filename):
+            return None
+        if any(name.endswith('.crdownload') for name in os.listdir(self.directory)):
+            return None
+        return os.path.getsize(self.filename)
+
+    def wait(self, timeout=30, settle=DOWNLOAD_POLL_INTERVAL):
+        deadline = time.monotonic() + timeout
+        while True:
+            size = self.finished_size()
+            if size is not None:
+                time.sleep(settle)
+                if self.finished_size() == size:
+                    return self.filename
+                continue
 
-# Fill out form
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise FileNotFoundError(
+                    f"File '{self.filename}' was not found after waiting for {timeout} seconds.")
+            if self.observer is not None:
+                self.events.changed.wait(remaining)
+                self.events.changed.clear()
+            else:
+                time.sleep(min(DOWNLOAD_POLL_INTERVAL, remaining))
 
+# Report period
+
+# Seasons from 2010 on can be picked from the dropdown of full seasons, as
+# e.g. '2021-2022'. Anything else is sent as a date range, and a single
+# season before 2010 runs from September 1st to August 31st. Returns the
+# season name, or None and the start and end dates.
 
-def fill_out_form(driver, start_year, end_year, top_n):
+
+def report_period(start_year, end_year):
 
     # Match the year to corresponding season for the dropdown menu of full seasons
     years = np.arange(2010, 2024)
-    seasons = {f'{y-1}-{y}': y for y in years}
-
-    # Find the corresponding season value for the given year
-    if start_year in seasons.values():
-        season = [key for key, value in seasons.items() if value ==
-                  start_year][0]
+    seasons = {y: f'{y-1}-{y}' for y in years}
 
     if end_year == None:
-        range = 0
+        span = 0
     else:
-        range = end_year - start_year
+        span = end_year - start_year
+
+    if start_year > 2009 and span <= 1:
+        return seasons[start_year], None, None
+
+    # Create end date for single season input since the website requires a date range
+    if start_year < 2010:
+        start_year = start_year - 1
+        end_year = start_year + 1
+
+    # Calculate start and end dates
+    return None, f"09/01/{start_year}", f"08/31/{end_year}"
+
+# Fill out form
+
+
+def fill_out_form(driver, start_year, end_year, top_n):
+
+    season, start_date, end_date = report_period(start_year, end_year)
 
     # Select competition year or date range
-    if start_year > 2009 and range <= 1:
+    if season is not None:
 
         # Find the corresponding option value for the given season using JavaScript
         js_get_option_value = f'''
@@ -79,15 +281,6 @@ def fill_out_form(driver, start_year, end_year, top_n):
 
     else:
 
-        # Create end date for single season input since the website requires a date range
-        if start_year < 2010:
-            start_year = start_year - 1
-            end_year = start_year + 1
-
-        # Calculate start and end dates
-        start_date = f"09/01/{start_year}"
-        end_date = f"08/31/{end_year}"
-
         # JavaScript code to set the start and end dates
         js_set_dates = f'''
         var start_date_element = document.getElementById("Times_SecondaryOrgTopTimes_Index_Div_1StartDate");
@@ -133,93 +326,257 @@ def fill_out_form(driver, start_year, end_year, top_n):
 
 # Get NCAA results from USA Swimming
 
-def get_NCAA_results(top_n, start_year, end_year=None):
+def get_NCAA_results(top_n, start_year, end_year=None, session=None):
 
-    # Set up the Chrome driver
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")  # Use headless mode
-    driver = webdriver.Chrome(options=chrome_options)
+    # Use a browser of our own if no session was passed in
+    if session is None:
+        with BrowserSession() as session:
+            return get_NCAA_results(top_n, start_year, end_year, session)
 
-    url = 'https://www.usaswimming.org/times/otherorganizations/ncaa-division-i/top-times-report'
-    driver.get(url)
+    # Download the report into a directory of its own
+    download_dir = session.download_dir or ''
+    os.makedirs(download_dir or '.', exist_ok=True)
+    job_dir = tempfile.mkdtemp(prefix=f'{start_year}_', dir=download_dir or '.')
 
     try:
-        # Check if consent button exists and click it
-        consent_button = driver.find_element(
-            By.XPATH, "//button[contains(@class, 'fc-cta-consent')]")
-        consent_button.click()
-    except NoSuchElementException:
-        # Consent button does not exist, continue with script
-        pass
-
-    # Wait for the page to load by waiting for the presence of the dropdown menu
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.ID, "Times_SecondaryOrgTopTimes_Index_Div_1ddlDateRanges")))
-
-    fill_out_form(driver, start_year, end_year, top_n)
-
-    # # Take a screenshot of the page
-    # default_download_path = os.path.join(os.path.expanduser("~"), "Downloads")
-    # screenshot_filename = os.path.join(default_download_path, "screenshot.png")
-    # driver.save_screenshot(screenshot_filename)
-    # print(f"Screenshot saved at {screenshot_filename}")
-
-    # Click "Find Times"
-    find_times_button = WebDriverWait(driver, 10).until(
-        EC.element_to_be_clickable((By.ID, "saveButton")))
-    find_times_button.click()
-
-    # Select the "Csv" option
-    output_types_dropdown = WebDriverWait(driver, 120).until(
-        EC.element_to_be_clickable((By.ID, "OutputTypes")))
-    output_types_dropdown.click()
-
-    csv_option = driver.find_element(
-        By.XPATH, "//select[@id='OutputTypes']/option[@value='Csv']")
-    csv_option.click()
-
-    # Click the download button
-    image_element = driver.find_element(
-        By.XPATH, "//div[@class='usas-reports-reportviewer-outer-top-right']/img")
-    image_element.click()
-
-    # Find the downloaded CSV file in the current working directory
-    csv_filename = "Report.csv"
-
-    # Wait for the file to be downloaded
-    max_wait_time = 30
-    wait_interval = 1
-    wait_time = 0
-    while not os.path.isfile(csv_filename) and wait_time < max_wait_time:
-        time.sleep(wait_interval)
-        wait_time += wait_interval
-
-    if not os.path.isfile(csv_filename):
-        raise FileNotFoundError(
-            f"File '{csv_filename}' was not found after waiting for {max_wait_time} seconds.")
-
-    # Rename file
-    if end_year is None:
-        new_csv_filename = f"{start_year}.csv"
-    else:
-        new_csv_filename = f"{start_year}-{end_year}.csv"
+        csv_filename = session.download_report(
+            top_n, start_year, end_year, job_dir)
 
-    # Rename the file in the current directory
-    os.rename(csv_filename, new_csv_filename)
-
-    # Clean the CSV file
-    df = clean_ncaa_swimming_data(new_csv_filename)
+        # Clean the CSV file straight from the download directory
+        df = clean_ncaa_swimming_data(csv_filename)
+    finally:
+        # Delete the report and "GetReport.pdf" along with the job's directory
+        shutil.rmtree(job_dir, ignore_errors=True)
 
     # Save the cleaned CSV file
+    if end_year is None:
+        new_csv_filename = os.path.join(download_dir, f"{start_year}.csv")
+    else:
+        new_csv_filename = os.path.join(
+            download_dir, f"{start_year}-{end_year}.csv")
     df.to_csv(new_csv_filename, index=False)
 
-    # Delete the "GetReport.pdf" file from the current working directory
-    pdf_filename = "GetReport.pdf"
+    return df, new_csv_filename
 
-    if os.path.isfile(pdf_filename):
-        os.remove(pdf_filename)
 
-    return df, new_csv_filename
+# Get NCAA results for many seasons at once
+
+# The seasons are shared out to max_workers browsers (or sessions of
+# session_class), each saving its cleaned files to a directory of its own
+# under download_dir. Most of a report's time is spent waiting on the report
+# server, so the seasons download side by side. A season that fails is
+# retried, on a fresh session, up to retries more times.
+#
+# Returns the cleaned frames keyed by season, and a frame with one row per
+# attempt giving the worker, the season, how long it took and whether it
+# worked. Seasons that failed every attempt are left out of the results.
+
+
+def get_NCAA_results_batch(top_n, seasons, max_workers=4, retries=2,
+                           download_dir=None, session_class=BrowserSession):
+    if download_dir is None:
+        download_dir = tempfile.mkdtemp(prefix='usasw_')
+
+    jobs = queue.Queue()
+    for season in seasons:
+        jobs.put(season)
+
+    def worker(worker_id):
+        results = {}
+        timings = []
+        worker_dir = os.path.join(download_dir, f'worker_{worker_id}')
+        with session_class(download_dir=worker_dir) as session:
+            while True:
+                try:
+                    season = jobs.get_nowait()
+                except queue.Empty:
+                    break
+
+                for attempt in range(retries + 1):
+                    start = time.perf_counter()
+                    try:
+                        df, filename = get_NCAA_results(
+                            top_n, season, session=session)
+                    except Exception as error:
+                        timings.append({
+                            'worker': worker_id, 'season': season, 'attempt': attempt,
+                            'seconds': time.perf_counter() - start,
+                            'status': f'failed: {error!r}'})
+                        # Start the next attempt with a new session
+                        session.close()
+                    else:
+                        timings.append({
+                            'worker': worker_id, 'season': season, 'attempt': attempt,
+                            'seconds': time.perf_counter() - start,
+                            'status': 'ok'})
+                        results[season] = df
+                        break
+        return results, timings
+
+    results = {}
+    timings = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for worker_results, worker_timings in executor.map(
+                worker, range(max_workers)):
+            results.update(worker_results)
+            timings += worker_timings
+
+    results = {season: results[season] for season in seasons if season in results}
+    columns = ['worker', 'season', 'attempt', 'seconds', 'status']
+    return results, pd.DataFrame(timings, columns=columns)
+
+
+# Checkpointed backfills
+
+# A backfill is made of units, one report per season (or (start_year,
+# end_year) range) at top_n. The state of every unit is kept in
+# backfill.json in download_dir, which is rewritten after each change, so a
+# backfill that was stopped or crashed can be run again with the same
+# arguments and only fetches the units that are not done yet. A unit is
+# 'pending', 'running', 'done' (with the path of its cleaned csv file) or
+# 'failed' (with the last error). A unit that fails waits backoff * 2 **
+# attempt seconds before it is tried again, up to retries more times per
+# run, while the other units carry on. No more than max_concurrency reports
+# are fetched at once. The cleaned files are saved to download_dir/top_N.
+#
+# Returns a frame with one row per unit, in the order of seasons.
+
+BACKFILL_STATE_FILE = 'backfill.json'
+
+
+def backfill_unit_key(start_year, end_year, top_n):
+    if end_year is None:
+        return f'{start_year}_top{top_n}'
+    return f'{start_year}-{end_year}_top{top_n}'
+
+
+def load_backfill_state(state_file):
+    if not os.path.exists(state_file):
+        return {'version': 1, 'units': {}}
+    with open(state_file) as f:
+        return json.load(f)
+
+
+def save_backfill_state(state, state_file):
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, state_file)
+
+
+def run_backfill(top_n, seasons, download_dir, max_concurrency=4, retries=3,
+                 backoff=30, session_class=BrowserSession):
+    os.makedirs(download_dir, exist_ok=True)
+    state_file = os.path.join(download_dir, BACKFILL_STATE_FILE)
+    output_dir = os.path.join(download_dir, f'top_{top_n}')
+    state = load_backfill_state(state_file)
+    units = state['units']
+
+    keys = []
+    for season in seasons:
+        start_year, end_year = season if isinstance(season, tuple) else (season, None)
+        key = backfill_unit_key(start_year, end_year, top_n)
+        if key in keys:
+            continue
+        keys.append(key)
+        unit = units.setdefault(key, {
+            'start_year': start_year, 'end_year': end_year, 'top_n': top_n,
+            'status': 'pending', 'attempts': 0, 'path': None, 'error': None})
+
+        # Fetch again if the file of a finished unit has gone missing
+        if unit['status'] == 'done' and not os.path.exists(unit['path']):
+            unit['status'] = 'pending'
+    save_backfill_state(state, state_file)
+
+    # Units waiting to run, as (time they can start, key)
+    pending = [(0, key) for key in keys if units[key]['status'] != 'done']
+    heapq.heapify(pending)
+    failures = {key: 0 for key in keys}
+    ready = threading.Condition()
+    running = 0
+    stopped = False
+
+    def update(key, **values):
+        units[key].update(values)
+        save_backfill_state(state, state_file)
+
+    def next_unit():
+        nonlocal running
+        with ready:
+            while not stopped:
+                if pending:
+                    delay = pending[0][0] - time.monotonic()
+                    if delay <= 0:
+                        key = heapq.heappop(pending)[1]
+                        running += 1
+                        update(key, status='running')
+                        return key
+                    ready.wait(delay)
+                elif running:
+                    # A running unit may fail and come back to the queue
+                    ready.wait()
+                else:
+                    return None
+            return None
+
+    # Let the running units finish, but don't start any more
+    def stop():
+        nonlocal stopped
+        with ready:
+            stopped = True
+            ready.notify_all()
+
+    def worker():
+        nonlocal running
+        with session_class(download_dir=output_dir) as session:
+            while True:
+                key = next_unit()
+                if key is None:
+                    break
+
+                unit = units[key]
+                try:
+                    df, filename = get_NCAA_results(
+                        top_n, unit['start_year'], unit['end_year'], session=session)
+                except BaseException as error:
+                    if not isinstance(error, Exception):
+                        with ready:
+                            running -= 1
+                            update(key, status='pending')
+                        stop()
+                        raise
+
+                    # Start the next attempt with a new session
+                    session.close()
+                    with ready:
+                        running -= 1
+                        failures[key] += 1
+                        update(key, status='failed', attempts=unit['attempts'] + 1,
+                               error=repr(error))
+                        if failures[key] <= retries:
+                            wait = backoff * 2 ** (failures[key] - 1)
+                            heapq.heappush(pending, (time.monotonic() + wait, key))
+                        ready.notify_all()
+                else:
+                    with ready:
+                        running -= 1
+                        update(key, status='done', attempts=unit['attempts'] + 1,
+                               path=filename, error=None)
+                        ready.notify_all()
+
+    workers = min(max_concurrency, len(pending))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [executor.submit(worker) for _ in range(workers)]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            stop()
+            raise
+
+    columns = ['start_year', 'end_year', 'top_n', 'status', 'attempts', 'path', 'error']
+    return pd.DataFrame([units[key] for key in keys], index=pd.Index(keys, name='unit'),
+                        columns=columns)
 
 
 if __name__ == "__main__":
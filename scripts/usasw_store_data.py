@@ -0,0 +1,199 @@
+# This script stores the cleaned USA Swimming top times in data/csv_times as a partitioned Parquet dataset
+# The first function, read_csv_times(), reads one of the season csv files back with the right data types.
+# build_times_store() writes every season to data/times_parquet, split into one folder per season and gender,
+# and load_times() reads the store back, only opening the seasons, genders and events that are asked for.
+# load_csv_times() reads every season csv file in parallel into one compact frame for the analysis notebook
+
+# Import libraries
+import pandas as pd
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+CSV_TIMES_DIR = os.path.join('..', 'data', 'csv_times')
+TIMES_STORE_DIR = os.path.join('..', 'data', 'times_parquet')
+
+# Columns that repeat the same few values are marked 'dictionary'. Parquet
+# dictionary encodes the pages of every text column, but these are written
+# as plain strings so their row group statistics can be used by the event
+# filter (pyarrow skips the statistics of dictionary typed columns), and are
+# read back as dictionaries, which pandas turns into categories. The season
+# and gender are the folder names rather than columns in the files.
+
+TIMES_SCHEMA = [
+    ('name', 'string'),
+    ('event', 'dictionary'),
+    ('distance', 'int16'),
+    ('stroke', 'dictionary'),
+    ('course', 'dictionary'),
+    ('time_(string)', 'string'),
+    ('time_(seconds)', 'float64'),
+    ('time_(HH:MM:SS)', 'duration'),
+    ('date', 'timestamp'),
+    ('team', 'dictionary'),
+    ('meet', 'dictionary'),
+    ('birth_date', 'timestamp'),
+    ('event_id', 'int16'),
+]
+
+# Read a cleaned season csv file
+
+
+def read_csv_times(csv_file):
+    df = pd.read_csv(csv_file, parse_dates=['date', 'birth_date'])
+
+    # The timedelta column is saved as text like '0 days 00:00:20.790000'
+    df['time_(HH:MM:SS)'] = pd.to_timedelta(df['time_(HH:MM:SS)'])
+    df['season'] = df['season'].astype(int)
+    return df
+
+
+def arrow_type(kind):
+    if kind in ('dictionary', 'string'):
+        return pa.string()
+    if kind == 'duration':
+        return pa.duration('ns')
+    if kind == 'timestamp':
+        return pa.timestamp('ns')
+    return getattr(pa, kind)()
+
+
+def times_schema():
+    if pa is None:
+        raise ImportError('pyarrow is required to write the times store')
+    return pa.schema([pa.field(column, arrow_type(kind))
+                      for column, kind in TIMES_SCHEMA])
+
+# Missing values are written as nulls. Categorical columns are converted
+# from their values, since the codes would otherwise be written.
+
+
+def times_table(df, schema):
+    arrays = []
+    for field in schema:
+        values = df[field.name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+# LOAD EVERY SEASON INTO ONE COMPACT FRAME
+
+# The text columns below repeat a few dozen values across every season, so
+# they become categoricals that share one set of categories. Each season is
+# converted before the concat, which can then join the codes without
+# re-encoding anything. The small integer columns are downcast. The times
+# stay float64 so the seconds match the csv files exactly. Pass observed=True
+# when grouping on the categoricals to skip combinations that never occur.
+
+CATEGORY_COLUMNS = ['event', 'stroke', 'course', 'gender', 'team', 'meet']
+INTEGER_COLUMNS = {'distance': 'int16', 'season': 'int16', 'event_id': 'int16'}
+
+
+def compact_times(frames):
+    for column in CATEGORY_COLUMNS:
+        values = pd.concat([df[column] for df in frames]).dropna().unique()
+        categories = pd.Index(sorted(values))
+        for df in frames:
+            df[column] = pd.Categorical(df[column], categories=categories)
+    for df in frames:
+        for column, dtype in INTEGER_COLUMNS.items():
+            df[column] = df[column].astype(dtype)
+    return frames
+
+
+def memory_report(before, after):
+    report = pd.DataFrame({'before': before, 'after': after})
+    report.loc['total'] = report.sum()
+    report['ratio'] = report['before'] / report['after']
+    return report
+
+
+# Returns the combined frame and a report of the memory used by each column
+# (in bytes) before and after the conversion
+
+def load_csv_times(csv_dir=CSV_TIMES_DIR, max_workers=8):
+    csv_files = sorted(glob.glob(os.path.join(csv_dir, '*.csv')))
+    if not csv_files:
+        raise FileNotFoundError(f'No season csv files found in {csv_dir}')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(read_csv_times, csv_files))
+
+    before = sum(df.memory_usage(deep=True, index=False) for df in frames)
+    frames = compact_times(frames)
+    df = pd.concat(frames, ignore_index=True, copy=False)
+    after = df.memory_usage(deep=True, index=False)
+    return df, memory_report(before, after)
+
+# WRITE THE TIMES STORE
+
+# Each season and gender is written to season=YYYY/gender=G/part-0.parquet,
+# sorted by event with one row group per event, so a filter on the event
+# can skip the row groups of every other event using their statistics.
+
+
+def write_times_partitions(df, store_dir=TIMES_STORE_DIR):
+    schema = times_schema()
+    files = []
+    for (season, gender), group in df.groupby(['season', 'gender']):
+        partition_dir = os.path.join(
+            store_dir, f'season={season}', f'gender={gender}')
+        os.makedirs(partition_dir, exist_ok=True)
+        filename = os.path.join(partition_dir, 'part-0.parquet')
+
+        group = group.sort_values(
+            ['event', 'time_(seconds)'], kind='stable')
+        with pq.ParquetWriter(filename, schema) as writer:
+            for _, rows in group.groupby('event', sort=False):
+                writer.write_table(times_table(rows, schema))
+        files.append(filename)
+    return files
+
+
+def build_times_store(csv_dir=CSV_TIMES_DIR, store_dir=TIMES_STORE_DIR):
+    files = []
+    for csv_file in sorted(glob.glob(os.path.join(csv_dir, '*.csv'))):
+        files += write_times_partitions(read_csv_times(csv_file), store_dir)
+    return files
+
+# LOAD THE TIMES STORE
+
+# Season, gender and event filters are passed down to pyarrow, which only
+# opens the season/gender folders that match and only reads the row groups
+# of the matching events, and only for the requested columns. Any other
+# pyarrow filters (e.g. [('distance', '>=', 200)]) can be added with filters.
+
+
+def load_times(store_dir=TIMES_STORE_DIR, columns=None, start_season=None,
+               end_season=None, events=None, genders=None, filters=None):
+    if pa is None:
+        raise ImportError('pyarrow is required to read the times store')
+
+    filters = list(filters or [])
+    if start_season is not None:
+        filters.append(('season', '>=', start_season))
+    if end_season is not None:
+        filters.append(('season', '<=', end_season))
+    if genders is not None:
+        filters.append(('gender', 'in', list(genders)))
+    if events is not None:
+        filters.append(('event', 'in', list(events)))
+
+    dictionary_columns = [column for column, kind in TIMES_SCHEMA
+                          if kind == 'dictionary']
+    table = pq.read_table(store_dir, columns=columns,
+                          filters=filters or None, partitioning='hive',
+                          read_dictionary=dictionary_columns)
+    df = table.to_pandas()
+
+    # The folder names come back as categories, so make the season a number again
+    if 'season' in df.columns:
+        df['season'] = df['season'].astype(int)
+    return df
@@ -0,0 +1,83 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The scripts are run from the scripts folder and import each other directly
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts')
+DATA_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'data')
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+# Benchmarks are marked slow and only run with --runslow
+def pytest_addoption(parser):
+    parser.addoption('--runslow', action='store_true',
+                     help='also run the benchmarks marked slow')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: benchmark, only run with --runslow')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--runslow'):
+        return
+    skip_slow = pytest.mark.skip(reason='benchmark, run with --runslow')
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip_slow)
+
+
+# A synthetic top-times export in the same format USA Swimming uses, with a
+# few events that are not swum at NCAAs mixed in
+def synthetic_top_times_export(n_rows=100000, seed=23):
+    rng = np.random.default_rng(seed)
+    events = ['50 Freestyle', '100 Freestyle', '200 Freestyle', '500 Freestyle',
+              '1000 Freestyle', '1650 Freestyle', '100 Backstroke', '200 Backstroke',
+              '100 Breaststroke', '200 Breaststroke', '100 Butterfly', '200 Butterfly',
+              '200 Individual Medley', '400 Individual Medley', '200 Medley Relay',
+              '400 Medley Relay', '200 Freestyle Relay', '400 Freestyle Relay',
+              '800 Freestyle Relay', '100 Individual Medley', '400 Freestyle']
+    teams = ['Texas, University of', 'California, University of, Berkeley',
+             'Stanford University', 'Virginia, University of', 'Auburn University']
+
+    event = rng.integers(0, len(events), n_rows)
+    gender = rng.choice(['Female', 'Male'], n_rows)
+    hundredths = rng.integers(1900, 90000, n_rows)
+    minutes, rest = np.divmod(hundredths, 6000)
+    times = [f'{m}:{r // 100:02d}.{r % 100:02d}' if m else f'{r // 100}.{r % 100:02d}'
+             for m, r in zip(minutes, rest)]
+    dates = pd.Timestamp('2022-09-01') + pd.to_timedelta(
+        rng.integers(0, 240, n_rows), unit='D')
+
+    df = pd.DataFrame({
+        'full_desc': [f'{events[e]} SCY {g}' for e, g in zip(event, gender)],
+        'event_id': event + 1,
+        'swim_time': times,
+        'swim_time_as_time': [f'00:{t}' if m else f'00:00:{t}' for m, t in zip(minutes, times)],
+        'swim_time_sec': hundredths / 100,
+        'swim_date': dates.strftime('%-m/%-d/%Y'),
+        'full_name_computed': [f'Swimmer{i}, Test' for i in rng.integers(0, 20000, n_rows)],
+        'team_short_name': rng.choice(teams, n_rows),
+        'meet_name': '2023 NCAA Division I Championships',
+        'birth_date': '1/1/2002',
+    })
+    for column in ["team_code", "converted_time_flag", "alt_adjust_flag", "elig_period_code",
+                   "standard_name", "RANK", "full_desc_intl", "fina_points",
+                   "country_code", "meet_city", "time_is_for_ineligible_secondary_team_yn"]:
+        df[column] = ''
+
+    # Fields are wrapped as ="..." except the ones with a comma in them,
+    # which are quoted normally, like the location column in the records file
+    lines = pd.Series('="' + df.columns + '"').str.cat(sep=',')
+    fields = df.astype(str)
+    for column in fields.columns:
+        has_comma = fields[column].str.contains(',')
+        fields[column] = ('="' + fields[column] + '"').mask(
+            has_comma, '"' + fields[column] + '"')
+    rows = fields[fields.columns[0]].str.cat(
+        [fields[column] for column in fields.columns[1:]], sep=',')
+    return io.StringIO(lines + '\n' + rows.str.cat(sep='\n') + '\n')
@@ -0,0 +1,129 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import clean_utils
+import ncaa_record_scrape
+import usasw_clean_data
+from conftest import DATA_DIR, synthetic_top_times_export
+
+# Each benchmark times the current code against what it replaced, checks
+# they agree and prints the timings (run with pytest --runslow -s).
+
+
+# parse_swim_times() against the per-row df.loc loop the cleaners used to run.
+# The loop is only run on the first loop_rows times, since it takes minutes
+# on a million.
+@pytest.mark.slow
+def test_benchmark_swim_time_parser(n_rows=1000000, loop_rows=20000, seed=23):
+    hundredths = np.random.default_rng(seed).integers(1800, 100000, n_rows)
+    minutes, hundredths = np.divmod(hundredths, 6000)
+    times = [f'{m}:{h // 100:02d}.{h % 100:02d}' if m else f'{h // 100:02d}.{h % 100:02d}'
+             for m, h in zip(minutes, hundredths)]
+    df = pd.DataFrame({'time_(string)': times})
+
+    start = time.perf_counter()
+    seconds, invalid = clean_utils.parse_swim_times(df['time_(string)'])
+    vectorized = time.perf_counter() - start
+
+    loop_df = df[:loop_rows].copy()
+    start = time.perf_counter()
+    for i in range(len(loop_df)):
+        if len(loop_df.loc[i, 'time_(string)']) == 5:
+            loop_df.loc[i, 'time_(seconds)'] = float(
+                loop_df.loc[i, 'time_(string)'])
+        elif len(loop_df.loc[i, 'time_(string)']) == 7:
+            loop_df.loc[i, 'time_(seconds)'] = \
+                float(loop_df.loc[i, 'time_(string)'][:1])*60 + \
+                float(loop_df.loc[i, 'time_(string)'][2:4]) +\
+                float(loop_df.loc[i, 'time_(string)'][5:])/100
+        elif len(loop_df.loc[i, 'time_(string)']) == 8:
+            loop_df.loc[i, 'time_(seconds)'] = \
+                float(loop_df.loc[i, 'time_(string)'][:2])*60 + \
+                float(loop_df.loc[i, 'time_(string)'][3:5]) +\
+                float(loop_df.loc[i, 'time_(string)'][6:])/100
+    loop = time.perf_counter() - start
+
+    assert not invalid.any()
+    assert np.array_equal(loop_df['time_(seconds)'].to_numpy(),
+                          seconds[:loop_rows].to_numpy())
+
+    print(pd.DataFrame({
+        'rows': [n_rows, loop_rows],
+        'seconds': [vectorized, loop],
+        'rows_per_second': [n_rows / vectorized, loop_rows / loop],
+    }, index=['parse_swim_times', 'df.loc loop']))
+
+
+# clean_ncaa_swimming_data() on a synthetic top-times export
+@pytest.mark.slow
+def test_benchmark_clean_ncaa_swimming_data(n_rows=100000, seed=23):
+    export = synthetic_top_times_export(n_rows, seed)
+
+    start = time.perf_counter()
+    df = usasw_clean_data.clean_ncaa_swimming_data(export)
+    elapsed = time.perf_counter() - start
+
+    # Only the 100 IM and 400 free are not swum at NCAAs
+    assert 0 < len(df) < n_rows
+    assert df['time_(seconds)'].notna().all()
+
+    print(pd.DataFrame({
+        'rows': [n_rows],
+        'kept_rows': [len(df)],
+        'seconds': [elapsed],
+        'rows_per_second': [n_rows / elapsed],
+    }, index=['clean_ncaa_swimming_data']))
+
+
+# Each results PDF parsed with and without the event page pre-filter,
+# bypassing the page text cache so pdfplumber does the full work
+@pytest.mark.slow
+def test_benchmark_event_page_filter(years=range(2002, 2024), genders=['M', 'W']):
+    rows = []
+    for year in years:
+        if year == 2020:
+            continue
+        if year < 2006:
+            event_prefixes = ncaa_record_scrape.EARLY_EVENT_PREFIXES
+            record_prefixes = ncaa_record_scrape.EARLY_RECORD_PREFIXES
+        else:
+            event_prefixes = ncaa_record_scrape.LATER_EVENT_PREFIXES
+            record_prefixes = ncaa_record_scrape.LATER_RECORD_PREFIXES
+
+        for gender in genders:
+            filename = os.path.join(DATA_DIR, 'pdf_results', f'{gender}_{year}.pdf')
+            if not os.path.exists(filename):
+                continue
+
+            start = time.perf_counter()
+            full = ncaa_record_scrape.parse_results_pdf(
+                filename, event_prefixes, record_prefixes,
+                cache_file=None, prefilter=False)
+            full_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            filtered = ncaa_record_scrape.parse_results_pdf(
+                filename, event_prefixes, record_prefixes,
+                cache_file=None, prefilter=True)
+            filtered_time = time.perf_counter() - start
+
+            assert full == filtered, f'{filename}: pre-filter changed the records'
+
+            pages = ncaa_record_scrape.find_event_pages(filename, event_prefixes)
+            with ncaa_record_scrape.pdfplumber.open(filename) as pdf:
+                page_count = len(pdf.pages)
+
+            rows.append({'file': os.path.basename(filename),
+                         'pages': page_count,
+                         'event_pages': len(pages) if pages is not None else page_count,
+                         'full_seconds': full_time,
+                         'filtered_seconds': filtered_time,
+                         'speedup': full_time / filtered_time})
+
+    if not rows:
+        pytest.skip('no results PDFs in data/pdf_results')
+    print(pd.DataFrame(rows))
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+import clean_utils
+
+
+def test_parse_swim_times():
+    times = pd.Series(['21.49', '9.87', '1:40.26', '15:03.31', '1:02:03.45',
+                       ' 46.57 ', '1:60.00', '1:60:00.00', 'NT', 'DQ', '',
+                       ':19.08', None, np.nan])
+    seconds, invalid = clean_utils.parse_swim_times(times)
+    expected = [21.49, 9.87, 100.26, 903.31, 3723.45, 46.57] + [np.nan] * 8
+    np.testing.assert_array_equal(seconds.to_numpy(), expected)
+    assert invalid.tolist() == [False] * 6 + [True] * 8
+
+
+# The seconds match the arithmetic the df.loc loops used, to the last bit
+def test_parse_swim_times_matches_old_arithmetic():
+    hundredths = np.random.default_rng(23).integers(1800, 100000, 5000)
+    minutes, rest = np.divmod(hundredths, 6000)
+    times = [f'{m}:{r // 100:02d}.{r % 100:02d}' if m else f'{r // 100:02d}.{r % 100:02d}'
+             for m, r in zip(minutes, rest)]
+    expected = [float(t[:-6]) * 60 + float(t[-5:-3]) + float(t[-2:]) / 100
+                if ':' in t else float(t) for t in times]
+    seconds, _ = clean_utils.parse_swim_times(times)
+    assert seconds.tolist() == expected
+
+
+def test_normalize_dates_keeps_missing_dates():
+    dates, seasons = clean_utils.normalize_dates(
+        pd.Series(['2019', '23-Mar-19', '3/4/2019', None, np.nan], dtype=object))
+    assert dates.tolist()[:3] == [pd.Timestamp('2019-01-01'), pd.Timestamp('2019-03-23'),
+                                  pd.Timestamp('2019-03-04')]
+    assert dates[3:].isna().all()
+    assert seasons.tolist()[:3] == [2019, 2019, 2019]
+    assert seasons[3:].isna().all()
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import ncaa_record_scrape
+from conftest import DATA_DIR
+
+PREFIX_SETS = [
+    (ncaa_record_scrape.LATER_EVENT_PREFIXES, ncaa_record_scrape.LATER_RECORD_PREFIXES),
+    (ncaa_record_scrape.EARLY_EVENT_PREFIXES, ncaa_record_scrape.EARLY_RECORD_PREFIXES),
+]
+
+PAGE_TEXT = '\n'.join([
+    'NCAA Division I Championships - 3/23/2019',
+    'Event 1  Women 200 Yard Freestyle Relay',
+    'NCAA: R 1:25.38 3/22/2018 California',
+    'Championship: C 1:25.38 2018 California',
+    'Men 200 Yard Medley Relay',
+    'EVENT 2  Women 500 Yard Freestyle',
+    'NCAA Record: 4:24.06 3/15/2017 Ledecky, Katie',
+    'NCAA:NCAA Record',
+    ' Event 3 indented',
+    'Eventually a line that only shares the prefix',
+    'Championship',
+    '',
+    '1 Texas 1:26.33 19',
+    'Men',
+    'NCAA',
+])
+
+
+# The per-line checks parse_results_pdf() used before the compiled classifier
+def startswith_lines(text, event_prefixes, record_prefixes):
+    lines = text.split('\n')
+    return ([line for line in lines if any(
+                line.startswith(prefix) for prefix in event_prefixes)],
+            [line for line in lines if any(
+                line.startswith(prefix) for prefix in record_prefixes)])
+
+
+def classified_lines(text, event_prefixes, record_prefixes):
+    classify_lines = ncaa_record_scrape.compile_line_classifier(
+        tuple(event_prefixes), tuple(record_prefixes))
+    event_lines, record_lines = [], []
+    for line, is_event, is_record in classify_lines(text):
+        if is_event:
+            event_lines.append(line)
+        if is_record:
+            record_lines.append(line)
+    return event_lines, record_lines
+
+
+@pytest.mark.parametrize('event_prefixes, record_prefixes', PREFIX_SETS)
+def test_classifier_matches_startswith(event_prefixes, record_prefixes):
+    assert classified_lines(PAGE_TEXT, event_prefixes, record_prefixes) == \
+        startswith_lines(PAGE_TEXT, event_prefixes, record_prefixes)
+
+
+def test_line_with_both_prefixes_is_both():
+    classify_lines = ncaa_record_scrape.compile_line_classifier(('NCAA',), ('NCAA:',))
+    assert list(classify_lines('NCAA: 18.23\nNCAA Record\nEvent')) == \
+        [('NCAA: 18.23', True, True), ('NCAA Record', True, False)]
+
+
+# The first pages of an early and a later results PDF
+@pytest.mark.parametrize('filename, event_prefixes, record_prefixes', [
+    ('M_2004.pdf', *PREFIX_SETS[1]),
+    ('W_2019.pdf', *PREFIX_SETS[0]),
+])
+def test_classifier_matches_startswith_on_results_pages(filename, event_prefixes,
+                                                        record_prefixes):
+    filename = os.path.join(DATA_DIR, 'pdf_results', filename)
+    if not os.path.exists(filename):
+        pytest.skip(f'{filename} is missing')
+
+    texts = ncaa_record_scrape.extract_page_texts(filename, cache_file=None,
+                                                  pages=range(4))
+    for text in texts:
+        assert classified_lines(text, event_prefixes, record_prefixes) == \
+            startswith_lines(text, event_prefixes, record_prefixes)
@@ -0,0 +1,133 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ncaa_record_scrape
+
+PDF = b'%PDF-1.4\n' + bytes(range(256)) * 400
+
+
+# Serves PDF with an ETag, answering conditional and byte-range requests,
+# and keeps the headers of every request it gets
+class PdfServer:
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = '"v1"'
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                if self.headers.get('If-None-Match') == server.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                body, status = server.content, 200
+                byte_range = self.headers.get('Range')
+                if byte_range and self.headers.get('If-Range') == server.etag:
+                    start = int(byte_range.split('=')[1].rstrip('-'))
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header('Content-Range', f'bytes */{len(body)}')
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    body, status = body[start:], 206
+                self.send_response(status)
+                self.send_header('ETag', server.etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.link = f'http://127.0.0.1:{self.httpd.server_port}/W_2019.pdf'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def change(self, content):
+        self.content = content
+        self.etag = '"v2"'
+
+
+@pytest.fixture
+def server():
+    server = PdfServer(PDF)
+    yield server
+    server.httpd.shutdown()
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    work_dir, results_dir = tmp_path / 'work', tmp_path / 'pdf_results'
+    work_dir.mkdir()
+    results_dir.mkdir()
+    return str(work_dir), str(results_dir), str(results_dir / 'pdf_cache.json')
+
+
+def download(server, dirs, revalidate=False):
+    work_dir, results_dir, cache_file = dirs
+    ncaa_record_scrape.download_pdf_files(
+        {'W_2019.pdf': server.link}, dst_dir=work_dir, max_workers=1,
+        cache_file=cache_file, results_dir=results_dir, revalidate=revalidate)
+    ncaa_record_scrape.store_results_pdfs(work_dir, results_dir)
+    with open(os.path.join(results_dir, 'W_2019.pdf'), 'rb') as f:
+        return f.read()
+
+
+def test_cached_copy_is_reused_without_a_request(server, dirs):
+    assert download(server, dirs) == PDF
+    assert download(server, dirs) == PDF
+    assert len(server.requests) == 1
+
+
+def test_revalidate_gets_not_modified(server, dirs):
+    download(server, dirs)
+    assert download(server, dirs, revalidate=True) == PDF
+    assert server.requests[-1]['If-None-Match'] == '"v1"'
+    assert len(server.requests) == 2
+
+
+def test_changed_pdf_replaces_the_stored_copy(server, dirs):
+    download(server, dirs)
+    server.change(PDF[::-1])
+    assert download(server, dirs, revalidate=True) == PDF[::-1]
+
+    # The stored copy matches the cache again, so nothing is downloaded
+    assert download(server, dirs) == PDF[::-1]
+    assert len(server.requests) == 2
+
+
+def test_partial_download_is_resumed(server, dirs):
+    work_dir, results_dir, cache_file = dirs
+    download(server, dirs)
+    os.remove(os.path.join(results_dir, 'W_2019.pdf'))
+
+    # An interrupted run left the first half of the file behind
+    with open(os.path.join(work_dir, 'W_2019.pdf.part'), 'wb') as f:
+        f.write(PDF[:len(PDF) // 2])
+
+    assert download(server, dirs) == PDF
+    assert server.requests[-1]['Range'] == f'bytes={len(PDF) // 2}-'
+    assert not os.path.exists(os.path.join(work_dir, 'W_2019.pdf.part'))
+
+
+def test_complete_partial_download_is_fetched_again(server, dirs):
+    work_dir, results_dir, cache_file = dirs
+    download(server, dirs)
+    os.remove(os.path.join(results_dir, 'W_2019.pdf'))
+
+    # The run was interrupted after the last byte but before the rename
+    with open(os.path.join(work_dir, 'W_2019.pdf.part'), 'wb') as f:
+        f.write(PDF)
+
+    assert download(server, dirs) == PDF
+    assert server.requests[-2]['Range'] == f'bytes={len(PDF)}-'
+    assert 'Range' not in server.requests[-1]
+    assert not os.path.exists(os.path.join(work_dir, 'W_2019.pdf.part'))
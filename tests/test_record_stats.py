@@ -0,0 +1,225 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import clean_combined_records
+import usasw_clean_data
+from conftest import DATA_DIR
+
+
+RECORD_PROGRESSION_FILE = os.path.join(
+    os.path.dirname(DATA_DIR), 'ncaa_record_progression.csv')
+
+
+# The row loops both calculate_record_stats() functions used before they were
+# vectorized, kept as the reference. The USA Swimming one looks rows up by
+# label, so it is given frames that are already deduplicated and sorted,
+# where the labels are the positions.
+def loop_record_stats(df):
+
+    # Remove rows that share a meet_id, athlete_id, and event_id
+    df = df.drop_duplicates(
+        subset=['meet_id', 'athlete_id', 'event_id'], keep='first').reset_index(drop=True)
+
+    # Sort the dataframe by event_id, gender, and time in ascending order
+    df = df.sort_values(['event_id', 'gender', 'time_(seconds)'])
+
+    # Calculate the time difference between consecutive df within each event/gender group
+    time_diff = df.groupby(['event_id', 'gender'])['time_(seconds)'].diff()
+    time_diff = time_diff.fillna(0)
+    time_diff = time_diff[1:]
+    time_diff = pd.concat([time_diff, pd.Series([np.nan])], ignore_index=True)
+
+    # For the last record within each event/gender group, set the record_broken_by value to NaN
+    last_record_mask = df.groupby(['event_id', 'gender']).tail(1).index
+    time_diff[last_record_mask] = np.nan
+
+    # For df that are not new df, set the record_broken_by value to 0
+    time_diff[time_diff <= 0] = 0
+
+    # Add the record_broken_by column to the dataframe
+    df['record_broken_by'] = time_diff
+
+    # Initialize a dictionary to keep track of the new values for each athlete and event combination
+    total_improvement = {}
+
+    for i in range(len(df)):
+        # Get the current athlete and event IDs
+        record_sum = df.loc[i, 'record_broken_by']
+        athlete_id = df.loc[i, 'athlete_id']
+        event_id = df.loc[i, 'event_id']
+
+        # Check if the current observation has a record_broken_by value
+        if np.isnan(record_sum):
+            pass
+        else:
+
+            # Calculate the record improvement percentage
+            df.loc[i, 'record_improvement_%'] = (
+                record_sum/df.loc[i+1, 'time_(seconds)'])*100
+
+            # Check if the current athlete and event combination already has a record_sum
+            if (athlete_id, event_id) not in total_improvement:
+                # Calculate the sum of record_broken_by for the current athlete and event IDs
+                new_record_holder_sum = df[(df['athlete_id'] == athlete_id) & (
+                    df['event_id'] == event_id)]['record_broken_by'].sum()
+                total_improvement[(athlete_id, event_id)
+                                  ] = new_record_holder_sum
+            else:
+                # Use the existing record_sum for the current athlete and event combination
+                new_record_holder_sum = total_improvement[(
+                    athlete_id, event_id)]
+
+            # Update the new_record_holder_broken_by column in the first observation for the athlete and event combination
+            if i == df[(df['athlete_id'] == athlete_id) & (df['event_id'] == event_id)].index[0]:
+                df.loc[i, 'new_record_holder_broken_by'] = new_record_holder_sum
+                df.loc[i, 'new_record_holder_improvement_%'] = (
+                    new_record_holder_sum/((df.loc[i+1, 'time_(seconds)'])+new_record_holder_sum))*100
+
+            else:
+                # Set the remaining values to NaN
+                df.loc[i, 'new_record_holder_broken_by'] = np.nan
+                df.loc[i, 'new_record_holder_improvement_%'] = np.nan
+
+    return df
+
+
+def sorted_records(df):
+    df = df.drop_duplicates(subset=['meet_id', 'athlete_id', 'event_id'])
+    return df.sort_values(['event_id', 'gender', 'time_(seconds)']).reset_index(drop=True)
+
+
+def random_records(seed, n_rows=400):
+    rng = np.random.default_rng(seed)
+    times = rng.permutation(np.arange(n_rows)) / 100 + 20
+    return pd.DataFrame({
+        'name': rng.choice(list('ABCDEFGH'), n_rows),
+        'gender': rng.choice(['M', 'W'], n_rows),
+        'event_id': rng.integers(1, 6, n_rows),
+        'athlete_id': rng.integers(1, 30, n_rows).astype(float),
+        'meet_id': rng.integers(1, 200, n_rows),
+        'time_(seconds)': times,
+    })
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_record_stats_match_loop_on_random_records(seed):
+    df = random_records(seed)
+    expected = loop_record_stats(sorted_records(df))
+    pd.testing.assert_frame_equal(
+        usasw_clean_data.calculate_record_stats(df), expected, check_exact=True)
+
+
+def test_record_stats_match_loop_on_usasw_records():
+    df = usasw_clean_data.clean_ncaa_record_data(
+        os.path.join(DATA_DIR, 'NCAA_Records_(USASw).csv'))
+    expected = loop_record_stats(sorted_records(df))
+    pd.testing.assert_frame_equal(
+        usasw_clean_data.calculate_record_stats(df), expected, check_exact=True)
+
+
+def loop_combined_record_stats(df):
+
+    df = df.sort_values(
+        by=['season'], ascending=False).sort_values(
+        by=['event_id', 'gender', 'time_(seconds)'], ascending=[True, True, True]).reset_index(drop=True)
+
+    # CALCULATE RECORD IMPROVEMENT STATS
+
+    # Sort the dataframe by event_id, gender, and time in ascending order
+    time_diff = df.groupby(['event_id', 'gender'])['time_(seconds)'].diff()
+    time_diff = time_diff.fillna(0)
+    time_diff = time_diff[1:]
+    time_diff = pd.concat([time_diff, pd.Series([np.nan])], ignore_index=True)
+
+    # For the last record within each event/gender group, set the record_broken_by value to NaN
+    last_record_mask = df.groupby(['event_id', 'gender']).tail(1).index
+    time_diff[last_record_mask] = np.nan
+
+    # For df that are not new df, set the record_broken_by value to 0
+    time_diff[time_diff <= 0] = 0
+
+    # Add the record_broken_by column to the dataframe
+    df['record_broken_by'] = time_diff
+
+    # Initialize a dictionary to keep track of the new values for each athlete and event combination
+    total_improvement = {}
+
+    # Calculate record improvement and new record holder improvement
+    for i in range(len(df)):
+        record_sum = df.loc[i, 'record_broken_by']
+        athlete_id = df.loc[i, 'athlete_id']
+        event_id = df.loc[i, 'event_id']
+
+        if np.isnan(record_sum):
+            pass
+        else:
+
+            # Calculate the record improvement percentage
+            df.loc[i, 'record_improvement_%'] = (
+                record_sum/df.loc[i+1, 'time_(seconds)'])*100
+
+            # Skip all relays for new_record_holder stats
+            if 'Relay' in df.loc[i, 'stroke']:
+                continue
+            else:
+
+                # Check if the current athlete and event combination already has a record_sum
+                if (athlete_id, event_id) not in total_improvement:
+                    # Calculate the sum of record_broken_by for the current athlete and event IDs
+                    new_record_holder_sum = df[(df['athlete_id'] == athlete_id) & (
+                        df['event_id'] == event_id)]['record_broken_by'].sum()
+                    total_improvement[(athlete_id, event_id)
+                                      ] = new_record_holder_sum
+                else:
+                    # Use the existing record_sum for the current athlete and event combination
+                    new_record_holder_sum = total_improvement[(
+                        athlete_id, event_id)]
+
+                # Update the new_record_holder_broken_by column in the first observation for the athlete and event combination
+                if i == df[(df['athlete_id'] == athlete_id) & (df['event_id'] == event_id)].index[0]:
+                    df.loc[i, 'new_record_holder_broken_by'] = new_record_holder_sum
+                    df.loc[i, 'new_record_holder_improvement_%'] = (
+                        new_record_holder_sum/((df.loc[i, 'time_(seconds)'])+new_record_holder_sum))*100
+
+                else:
+                    # Set the remaining values to NaN
+                    df.loc[i, 'new_record_holder_broken_by'] = np.nan
+                    df.loc[i, 'new_record_holder_improvement_%'] = np.nan
+
+    df = clean_combined_records.calculate_seasons_between_records(df)
+    df = clean_combined_records.calculate_seasons_between_new_holders(df)
+
+    columns = [
+        'name', 'distance', 'stroke', 'course', 'gender', 'season',
+        'time_(seconds)', 'time_(string)',
+        'record_broken_by', 'record_improvement_%',
+        'new_record_holder', 'new_record_holder_broken_by', 'new_record_holder_improvement_%',
+        'seasons_between_records', 'seasons_between_new_holders',
+        'team', 'conference', 'date', 'meet',
+        'event_id', 'athlete_id', 'team_id', 'session', 'meet_id'
+    ]
+
+    df = df[columns]
+
+    df = df.sort_values(
+        by=['season'], ascending=False).sort_values(
+        by=['event_id', 'gender', 'time_(seconds)'], ascending=[True, True, True]).reset_index(drop=True)
+
+    return df
+
+
+
+# The floats are read with round_trip precision so they come back exactly as
+# they were written
+@pytest.mark.skipif(not os.path.exists(RECORD_PROGRESSION_FILE),
+                    reason='ncaa_record_progression.csv has not been built')
+def test_combined_record_stats_match_loop_on_progression():
+    df = pd.read_csv(RECORD_PROGRESSION_FILE, parse_dates=['date'],
+                     float_precision='round_trip')
+    stats = clean_combined_records.calculate_record_stats(df.copy())
+    pd.testing.assert_frame_equal(
+        stats, loop_combined_record_stats(df.copy()), check_exact=True)
+    pd.testing.assert_frame_equal(stats, df[stats.columns], check_exact=True)
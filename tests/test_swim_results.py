@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+import ncaa_record_scrape
+from conftest import DATA_DIR
+
+# Lines copied from the 2019 women's championship results (W_2019.pdf)
+W_2019_PAGE = '\n'.join([
+    'Event 17 Women 100 Yard Freestyle',
+    'NCAA: 45.56 I 18-Mar-17 Simone Manuel Stanford',
+    '47.35 AUTO NCAA A Standard',
+    'Name Yr School Prelim Time Finals Time Points',
+    'A - Final',
+    '1 Mallory Comerford SR Louisville 46.57 46.26P 20',
+    'r:+0.64 22.27 46.26 (23.99)',
+    '2 Anna Hopkin FR Arkansas 46.61 46.56 17',
+    'r:+0.64 22.03 46.56 (24.53)',
+    'Preliminaries',
+    '1 Mallory Comerford SR Louisville 46.57 46.57 q',
+    'r:+0.65 22.41 46.57 (24.16)',
+    'Event 8 Women 200 Yard Freestyle Relay',
+    'Team Relay Seed Time Prelim Time',
+    'Preliminaries',
+    '1 California 1:26.00 1:26.25 q',
+    '1) Maddie Murphy JR 2) r:0.21 Katie McLaughlin SR 3) r:0.27 Amy Bilquist SR 4) r:0.24 Abbey Weitzeil JR',
+    'r:+0.64 10.63 22.20 (22.20) 32.35 (10.15) 43.57 (21.37)',
+    '53.69 (10.12) 1:05.14 (21.57) 1:14.92 (9.78) 1:26.25 (21.11)',
+])
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    monkeypatch.setattr(ncaa_record_scrape, 'iter_page_texts',
+                        lambda filename, cache_file=None: iter([W_2019_PAGE]))
+    return list(ncaa_record_scrape.iter_swim_results('W_2019.pdf', 2019, 'W'))
+
+
+def test_final_and_prelim_lines(rows):
+    swims = [(row['round'], row['place'], row['name'], row['time_(seconds)'])
+             for row in rows]
+    assert swims == [
+        ('Finals', 1, 'Mallory Comerford', 46.26),
+        ('Finals', 2, 'Anna Hopkin', 46.56),
+        ('Prelims', 1, 'Mallory Comerford', 46.57),
+        ('Prelims', 1, 'California', 86.25),
+    ]
+    assert rows[0]['points'] == 20
+    assert rows[1]['team'] == 'Arkansas'
+
+
+def test_splits_leave_out_reaction_time(rows):
+    assert rows[0]['splits'] == [22.27, 46.26]
+    assert rows[3]['splits'] == [10.63, 22.20, 32.35, 43.57, 53.69, 65.14,
+                                 74.92, 86.25]
+    for row in rows:
+        assert row['splits'][-1] == row['time_(seconds)']
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(DATA_DIR, 'pdf_results', 'W_2019.pdf')),
+                    reason='W_2019.pdf has not been downloaded')
+def test_every_prelim_starts_at_first_place():
+    rows = ncaa_record_scrape.iter_swim_results(
+        os.path.join(DATA_DIR, 'pdf_results', 'W_2019.pdf'), 2019, 'W',
+        cache_file=None)
+    first_places = {}
+    for row in rows:
+        key = (row['event'], row['round'])
+        first_places[key] = min(first_places.get(key, row['place']), row['place'])
+    assert set(first_places.values()) == {1}
+    assert sum(round_name == 'Prelims' for _, round_name in first_places) > 0
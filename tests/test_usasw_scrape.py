@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import usasw_clean_data
+import usasw_scrape_data
+from conftest import synthetic_top_times_export
+
+REPORT_CSV = synthetic_top_times_export(n_rows=500).getvalue()
+
+
+# Stands in for BrowserSession, saving a top-times export in USA Swimming's
+# format as the downloaded report. Seasons in fail_seasons raise the given
+# errors, one per attempt.
+class RecordedSession:
+
+    def __init__(self, download_dir=None, fail_seasons=None, calls=None):
+        self.download_dir = download_dir
+        self.fail_seasons = fail_seasons if fail_seasons is not None else {}
+        self.calls = calls if calls is not None else []
+
+    def download_report(self, top_n, start_year, end_year, job_dir):
+        self.calls.append(start_year)
+        errors = self.fail_seasons.get(start_year)
+        if errors:
+            raise errors.pop(0)
+        csv_filename = os.path.join(job_dir, 'Report.csv')
+        with open(csv_filename, 'w') as f:
+            f.write(REPORT_CSV)
+        return csv_filename
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def test_get_NCAA_results_cleans_the_report(tmp_path):
+    session = RecordedSession(download_dir=str(tmp_path))
+    df, filename = usasw_scrape_data.get_NCAA_results(16, 2022, session=session)
+
+    report = tmp_path.parent / 'report.csv'
+    report.write_text(REPORT_CSV)
+    pd.testing.assert_frame_equal(
+        df, usasw_clean_data.clean_ncaa_swimming_data(str(report)))
+    assert filename == os.path.join(str(tmp_path), '2022.csv')
+
+    # Only the cleaned file is left, the job's directory is gone
+    assert os.listdir(tmp_path) == ['2022.csv']
+
+
+def test_download_watcher_waits_for_chrome_to_finish(tmp_path):
+    def download():
+        part = tmp_path / 'Report.csv.crdownload'
+        with open(part, 'w') as f:
+            for line in REPORT_CSV.splitlines(keepends=True)[:50]:
+                f.write(line)
+                f.flush()
+                time.sleep(0.005)
+        os.rename(part, tmp_path / 'Report.csv')
+
+    with usasw_scrape_data.DownloadWatcher(str(tmp_path)) as watcher:
+        threading.Thread(target=download).start()
+        filename = watcher.wait(timeout=10)
+    with open(filename) as f:
+        assert f.read() == ''.join(REPORT_CSV.splitlines(keepends=True)[:50])
+
+
+def test_download_watcher_times_out(tmp_path):
+    with usasw_scrape_data.DownloadWatcher(str(tmp_path)) as watcher:
+        with pytest.raises(FileNotFoundError):
+            watcher.wait(timeout=0.2)
+
+
+def test_run_backfill_resumes_after_an_interrupt(tmp_path):
+    calls = []
+    fail_seasons = {2012: [TimeoutError('report timed out')],
+                    2013: [TimeoutError('report timed out')] * 10,
+                    2015: [KeyboardInterrupt()]}
+
+    def session_class(download_dir=None):
+        return RecordedSession(download_dir, fail_seasons, calls)
+
+    seasons = list(range(2010, 2020))
+    with pytest.raises(KeyboardInterrupt):
+        usasw_scrape_data.run_backfill(
+            16, seasons, str(tmp_path), max_concurrency=1, retries=1,
+            backoff=0.01, session_class=session_class)
+
+    with open(tmp_path / 'backfill.json') as f:
+        units = json.load(f)['units']
+    assert units['2015_top16']['status'] == 'pending'
+    done = {key for key, unit in units.items() if unit['status'] == 'done'}
+    assert '2010_top16' in done
+
+    # The second run only fetches the units that aren't done
+    calls.clear()
+    result = usasw_scrape_data.run_backfill(
+        16, seasons, str(tmp_path), max_concurrency=2, retries=1,
+        backoff=0.01, session_class=session_class)
+    assert not done & {f'{season}_top16' for season in calls}
+    assert result.loc['2013_top16', 'status'] == 'failed'
+    assert (result.drop('2013_top16')['status'] == 'done').all()
+    assert result.loc['2012_top16', 'attempts'] == 2
+    for path in result['path'].dropna():
+        assert os.path.exists(path)